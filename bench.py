@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Headless benchmark for the display modes
+
+This drives every mode in modes.MODES for a number of frames using a
+stand in for the Mirror with no display. The knobs, temperature and
+local time are swept while it runs so the modes see a range of inputs.
+
+It reports the mean, 99th percentile and maximum time taken by each
+frame against the frame budget, and how much memory each frame
+allocates. A frame is the mode's update(), the check for whether the
+LEDs need writing and the brightness and gamma output stage. Like the
+mirror it skips the frames a mode asks to be left alone for. The time
+to send the LEDs down the strips is taken off the budget.
+
+The number of LEDs comes from layout.json, or use --leds or --layout
+to try a bigger mirror.
+
+Run it with python3 for a table, or with --json to save the results so
+runs can be compared.
+
+Use --boot to measure the time and memory taken to load the modes at
+boot, and --trig to time the trig in the modes which used math.sin
+against the tables in modes.trig.
+
+It also runs under micropython with no options, or from the REPL with
+
+    import bench
+    bench.run()
+    bench.run_trig()
+    bench.run_boot()
+"""
+
+import sys
+import time
+import random
+import gc
+import math
+import modes
+from modes import trig
+from framebuffer import Framebuffer
+from output import Output
+from knobs import Knobs
+from journal import Journal
+import layout
+
+try:
+    from time import ticks_us, ticks_diff
+except ImportError:
+    # CPython
+    def ticks_us():
+        return int(time.perf_counter() * 1000000)
+    def ticks_diff(a, b):
+        return a - b
+
+try:
+    import tracemalloc
+except ImportError:
+    # micropython
+    tracemalloc = None
+
+update_freq_hz = 25             # how often the mirror updates the LEDs
+budget_us = 1000000 // update_freq_hz
+
+try:
+    nleds = layout.load().n
+except OSError:
+    nleds = 34
+frames = 500
+
+def write_us(n):
+    """
+    Returns the time in us to send n LEDs down the strips
+
+    Each LED is 24 bits at 800 kHz, then the strip needs 50 us to latch.
+    """
+    return 30*n + 50
+
+def triangle(i, period):
+    """
+    Sweep 0..1..0 as i goes from 0 to period
+    """
+    x = 2 * (i % period) / period
+    if x > 1:
+        x = 2 - x
+    return x
+
+class Mirror(Framebuffer):
+    """
+    Stand in for the Infinity Mirror with no display
+
+    The knobs, temperature and local time are set by the benchmark
+    with sweep(i) before each frame.
+    """
+    def __init__(self, n=nleds):
+        Framebuffer.__init__(self, n)
+        self._knob = [0.5, 0.5, 0.5]
+        self.knobs = Knobs(lambda i: int(self._knob[i] * 65535))
+        self.journal = Journal(None)
+        self.temp = 20.0
+        self.time = (2023, 1, 1, 0, 0, 0, 6, 1, 0)
+    def sweep(self, i):
+        """
+        Set the inputs for frame i
+
+        The knobs sweep with co-prime periods so they visit lots of
+        combinations, the temperature sweeps 0..40C and the clock runs
+        at 17 seconds per frame.
+        """
+        self._knob[0] = triangle(i, 97)
+        self._knob[1] = triangle(i, 131)
+        self._knob[2] = triangle(i, 173)
+        self.knobs.sample()
+        self.temp = 40 * triangle(i, 211)
+        secs = (17 * i) % 86400
+        self.time = (2023, 1, 1, secs // 3600, (secs // 60) % 60, secs % 60, 6, 1, 0)
+    def knob(self, i):
+        """
+        Returns the value of knob i as 0..1
+        """
+        return self.knobs.value[i]
+    def knobs_changed(self):
+        """
+        Returns True if any of the knobs have moved since the mode was
+        last updated
+        """
+        return self.knobs.changed
+    def knob_brightness(self):
+        """
+        Brightness knob
+        """
+        return self.knob(0)
+    def knob_hue(self):
+        """
+        Hue knob
+        """
+        return self.knob(1)
+    def knob_speed(self):
+        """
+        Speed knob
+        """
+        return self.knob(2)
+    def temperature(self):
+        """
+        Return the temperature of the board in C as a floating point number
+        """
+        return self.temp
+    def local_time(self):
+        """
+        Returns the broken down local time
+        """
+        return self.time
+    def load_setting(self, name, default=None):
+        """
+        Returns the saved setting name or default
+        """
+        return self.journal.get(name, default)
+    def save_setting(self, name, value):
+        """
+        Save setting name - this is only kept in memory
+        """
+        self.journal.set(name, value)
+
+class Held:
+    """
+    Decides which frames to call mode.update() on
+
+    Like the Mirror this honours the mode's INTERVAL and the number of
+    frames returned by update(), and clears knobs_changed() after each
+    update.
+    """
+    def __init__(self, mode, mirror):
+        self.mode = mode
+        self.mirror = mirror
+        self.interval = getattr(mode, "INTERVAL", 1)
+        self.hold = 0
+    def update(self):
+        """
+        Call mode.update() if it is due
+        """
+        if self.hold > 0:
+            self.hold -= 1
+            return
+        frames = self.mode.update()
+        self.mirror.knobs.changed = False
+        if not frames:
+            frames = self.interval
+        self.hold = frames - 1
+    def close(self):
+        """
+        Call mode.close() if it has one
+        """
+        close = getattr(self.mode, "close", None)
+        if close:
+            close()
+
+def time_mode(cls, frames, n):
+    """
+    Run frames of mode cls returning a sorted list of frame times in us
+
+    Frames the mode asked to skip only take the time to check for
+    changes.
+    """
+    random.seed(1)
+    mirror = Mirror(n)
+    mode = Held(cls(mirror), mirror)
+    output = Output()
+    sent = bytearray(3*n)
+    out = bytearray(3*n)
+    times = []
+    gc.collect()
+    for i in range(frames):
+        mirror.sweep(i)
+        start = ticks_us()
+        mode.update()
+        # Like the Mirror, only output the frame if it or the brightness changed
+        output.set_brightness(mirror.knob_brightness())
+        if mirror.buf != sent or output.changed:
+            output.apply(mirror.buf, out)
+            sent[:] = mirror.buf
+        times.append(ticks_diff(ticks_us(), start))
+    mode.close()
+    times.sort()
+    return times
+
+def alloc_mode(cls, frames, n):
+    """
+    Run frames of mode cls returning a list of bytes allocated per frame
+
+    Under CPython this is the peak memory traced by tracemalloc during
+    the frame. Under micropython the garbage collector is paused and
+    this is the exact number of bytes allocated.
+    """
+    random.seed(1)
+    mirror = Mirror(n)
+    mode = Held(cls(mirror), mirror)
+    allocs = []
+    if tracemalloc:
+        tracemalloc.start()
+        for i in range(frames):
+            mirror.sweep(i)
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            mode.update()
+            allocs.append(tracemalloc.get_traced_memory()[1] - base)
+        tracemalloc.stop()
+    else:
+        for i in range(frames):
+            mirror.sweep(i)
+            gc.collect()
+            gc.disable()
+            base = gc.mem_alloc()
+            mode.update()
+            allocs.append(gc.mem_alloc() - base)
+            gc.enable()
+    mode.close()
+    return allocs
+
+def bench_mode(cls, frames=frames, n=nleds):
+    """
+    Benchmark mode cls returning a dict of results
+
+    Times are in ms and allocations in bytes.
+    """
+    times = time_mode(cls, frames, n)
+    allocs = alloc_mode(cls, frames, n)
+    budget = budget_us - write_us(n)
+    return {
+        "name": cls.NAME,
+        "mean_ms": sum(times) / len(times) / 1000,
+        "p99_ms": times[int(0.99 * (len(times) - 1))] / 1000,
+        "max_ms": times[-1] / 1000,
+        "over_budget": sum(1 for t in times if t > budget),
+        "alloc_bytes_mean": sum(allocs) / len(allocs),
+        "alloc_bytes_max": max(allocs),
+    }
+
+def run(frames=frames, n=nleds, only=None):
+    """
+    Benchmark all the modes, printing a table and returning the results
+
+    If only is set then just benchmark the modes with those ids.
+    """
+    results = {}
+    print("%-20s %8s %8s %8s %6s %10s %10s" % ("mode", "mean ms", "p99 ms", "max ms", "over", "alloc B", "max B"))
+    for i, name in enumerate(modes.MODES):
+        if only and name not in only:
+            continue
+        try:
+            r = bench_mode(modes.load(i), frames, n)
+        except ValueError as e:
+            # eg a mode which needs the geometry for another layout
+            print("%-20s skipped: %s" % (name, e))
+            continue
+        finally:
+            modes.unload(i)
+        results[name] = r
+        print("%-20s %8.3f %8.3f %8.3f %6d %10.1f %10d" % (name, r["mean_ms"], r["p99_ms"], r["max_ms"], r["over_budget"], r["alloc_bytes_mean"], r["alloc_bytes_max"]))
+    print("Budget is %.1f ms per frame, %.1f ms after writing %d LEDs, over is the number of frames which exceeded it" % (budget_us / 1000, (budget_us - write_us(n)) / 1000, n))
+    return results
+
+def run_boot(frames=None, n=None, only=None):
+    """
+    Measure the time and memory taken to import the modes and the first
+    mode as the mirror does at boot, printing and returning the results
+    """
+    global modes
+    for name in list(sys.modules):
+        if name == "modes" or name.startswith("modes."):
+            del sys.modules[name]
+    gc.collect()
+    if tracemalloc:
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+    else:
+        before = gc.mem_alloc()
+    start = ticks_us()
+    modes = __import__("modes")
+    modes.load(0)
+    took = ticks_diff(ticks_us(), start)
+    gc.collect()
+    if tracemalloc:
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+    else:
+        used = gc.mem_alloc() - before
+    loaded = sum(1 for name in sys.modules if name == "modes" or name.startswith("modes."))
+    print("Boot: %.2f ms, %d bytes, %d modules loaded" % (took / 1000, used, loaded))
+    return {
+        "boot_ms": took / 1000,
+        "boot_bytes": used,
+        "modules": loaded,
+    }
+
+def float_sin(t, count):
+    """
+    One frame of trig with math.sin
+    """
+    for i in range(count):
+        y = math.sin(t + 0.05*i)
+
+def float_sin2(t, count):
+    """
+    One frame of trig with math.sin squared
+    """
+    for i in range(count):
+        y = math.sin(t + 0.05*i)**2
+
+def table_sin(t, count):
+    """
+    One frame of trig with the sin table
+    """
+    step = trig.phase(0.05)
+    for i in range(count):
+        y = trig.sin(t + step*i)
+
+def table_sin2(t, count):
+    """
+    One frame of trig with the sin squared table
+    """
+    step = trig.phase(0.05)
+    for i in range(count):
+        y = trig.sin2(t + step*i)
+
+# The modes which used math.sin with the number of calls per LED and
+# the functions to time with floats and with the tables
+trig_modes = (
+    ("softglow", 3, float_sin, table_sin),
+    ("hsvwaves", 3, float_sin2, table_sin2),
+    ("christmas", 1, float_sin2, table_sin2),
+)
+
+def time_frames(fn, t, count, frames):
+    """
+    Return the mean time in us of frames calls of fn(t, count)
+    """
+    gc.collect()
+    start = ticks_us()
+    for i in range(frames):
+        fn(t, count)
+    return ticks_diff(ticks_us(), start) / frames
+
+def run_trig(frames=frames, n=nleds, only=None):
+    """
+    Time the trig for one frame of each mode which used math.sin
+    against the trig tables, printing a table and returning the results
+    """
+    results = {}
+    print("%-20s %10s %10s %10s" % ("mode", "float us", "table us", "saving us"))
+    for name, calls, float_fn, table_fn in trig_modes:
+        if only and name not in only:
+            continue
+        float_us = time_frames(float_fn, 1.0, n*calls, frames)
+        table_us = time_frames(table_fn, 1000, n*calls, frames)
+        results[name] = {
+            "float_us": float_us,
+            "table_us": table_us,
+            "saving_us": float_us - table_us,
+        }
+        print("%-20s %10.1f %10.1f %10.1f" % (name, float_us, table_us, float_us - table_us))
+    print("Times are per frame for the trig calls only")
+    return results
+
+def main():
+    import argparse
+    import json
+    import sys
+    import platform
+    parser = argparse.ArgumentParser(description="Benchmark the Infinity Mirror modes without a display")
+    parser.add_argument("--frames", type=int, default=frames, help="number of frames to run each mode for")
+    parser.add_argument("--leds", type=int, default=nleds, help="number of LEDs in the mirror")
+    parser.add_argument("--layout", metavar="FILE", help="take the number of LEDs from this layout file")
+    parser.add_argument("--mode", action="append", help="only benchmark this mode (by module name) - may be repeated")
+    parser.add_argument("--json", help="write the results as JSON to this file, - for stdout")
+    parser.add_argument("--trig", action="store_true", help="compare math.sin with the trig tables instead")
+    parser.add_argument("--boot", action="store_true", help="measure the time and memory to load the modes at boot instead")
+    args = parser.parse_args()
+    if args.layout:
+        args.leds = layout.load(args.layout).n
+
+    bench = run
+    if args.trig:
+        bench = run_trig
+    elif args.boot:
+        bench = run_boot
+    if args.json == "-":
+        # Keep stdout for the JSON
+        import contextlib
+        with contextlib.redirect_stdout(sys.stderr):
+            results = bench(args.frames, args.leds, args.mode)
+    else:
+        results = bench(args.frames, args.leds, args.mode)
+    if args.json:
+        out = {
+            "python": sys.implementation.name,
+            "version": platform.python_version(),
+            "machine": platform.machine(),
+            "frames": args.frames,
+            "leds": args.leds,
+            "budget_ms": budget_us / 1000,
+            "write_ms": write_us(args.leds) / 1000,
+            "modes": results,
+        }
+        if args.json == "-":
+            json.dump(out, sys.stdout, indent=2)
+            print()
+        else:
+            with open(args.json, "w") as f:
+                json.dump(out, f, indent=2)
+
+if __name__ == "__main__":
+    try:
+        import argparse
+    except ImportError:
+        # micropython
+        run()
+    else:
+        main()
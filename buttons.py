@@ -0,0 +1,168 @@
+"""
+Debounced button events for the mirror
+
+The button pins interrupt on both edges. The interrupt handler
+debounces the edge and puts it with its time stamp into a fixed size
+ring, so a press is never lost however long the frame takes. poll()
+drains the ring from the frame loop and turns the edges into events:
+
+- CLICK - a short press, sent once the double press window has passed
+- DOUBLE - a second press within double_ms of the end of a click
+- LONG - a press held for long_ms, sent while it is still held
+
+The timings use the time stamps from the interrupts, not the time
+poll() is called, so a slow frame doesn't change what the user meant.
+Nothing is allocated after setup.
+
+The simulator has no pins so it calls edge() from the mouse events.
+"""
+
+from array import array
+
+try:
+    from time import ticks_ms, ticks_diff
+    import machine
+except ImportError:
+    # CPython
+    import time
+    machine = None
+    def ticks_ms():
+        return int(time.monotonic() * 1000) & 0x3FFFFFFF
+    def ticks_diff(a, b):
+        return ((a - b + 0x20000000) & 0x3FFFFFFF) - 0x20000000
+
+# Events
+CLICK = 0
+DOUBLE = 1
+LONG = 2
+EVENTS = ("click", "double", "long")
+
+# States of each button
+IDLE = 0                        # waiting for a press
+DOWN = 1                        # pressed
+WAIT = 2                        # released, waiting to see if it is a double press
+IGNORE = 3                      # pressed but the event has been sent
+
+class Buttons:
+    """
+    Turns the edges of n buttons into events passed to handler(i, event)
+
+    Pass pins to drive it from pin interrupts, otherwise call edge()
+    whenever a button changes.
+    """
+    def __init__(self, handler, n=2, pins=None, debounce_ms=20, long_ms=1000, double_ms=250, size=16):
+        self.handler = handler
+        self.n = n
+        self.pins = pins
+        self.debounce_ms = debounce_ms
+        self.long_ms = long_ms
+        self.double_ms = double_ms
+        self.size = size
+        self.times = array("I", bytes(4*size))     # time stamp of each edge
+        self.codes = bytearray(size)                # 2*button + pressed
+        self.head = 0                               # written by the interrupt
+        self.tail = 0                               # read by poll()
+        self.pressed = bytearray(n)                 # debounced state
+        self.edge_time = array("I", bytes(4*n))     # time of the last edge
+        self.state = bytearray(n)
+        self.since = array("I", bytes(4*n))         # time the state started
+        self.bounces = 0
+        self.overflows = 0
+        if pins:
+            for i in range(n):
+                pins[i].irq(self.irq_handler(i), machine.Pin.IRQ_FALLING | machine.Pin.IRQ_RISING)
+    def irq_handler(self, i):
+        """
+        Returns the interrupt handler for button i
+        """
+        pin = self.pins[i]
+        def irq(p):
+            # The buttons pull the pins low when pressed
+            self.edge(i, pin.value() == 0)
+        return irq
+    def edge(self, i, pressed, t=None):
+        """
+        Button i has changed to pressed, time stamped t or now
+
+        Edges within debounce_ms of the last one are ignored.
+        """
+        if t is None:
+            t = ticks_ms()
+        if pressed == self.pressed[i]:
+            return
+        if ticks_diff(t, self.edge_time[i]) < self.debounce_ms:
+            self.bounces += 1
+            return
+        head = self.head
+        after = (head + 1) % self.size
+        if after == self.tail:
+            self.overflows += 1
+            return
+        self.pressed[i] = pressed
+        self.edge_time[i] = t
+        self.times[head] = t
+        self.codes[head] = 2*i + pressed
+        self.head = after
+    def resync(self):
+        """
+        Catch up with any pins whose last edge was lost while bouncing
+        """
+        for i in range(self.n):
+            pressed = self.pins[i].value() == 0
+            if pressed != self.pressed[i]:
+                irq_state = machine.disable_irq()
+                self.edge(i, pressed)
+                machine.enable_irq(irq_state)
+    def poll(self):
+        """
+        Send the events for the edges received since the last call
+
+        Call this every frame.
+        """
+        if self.pins:
+            self.resync()
+        while self.tail != self.head:
+            tail = self.tail
+            code = self.codes[tail]
+            t = self.times[tail]
+            self.tail = (tail + 1) % self.size
+            if code & 1:
+                self.down(code >> 1, t)
+            else:
+                self.up(code >> 1, t)
+        now = ticks_ms()
+        for i in range(self.n):
+            state = self.state[i]
+            if state == DOWN and ticks_diff(now, self.since[i]) >= self.long_ms:
+                self.state[i] = IGNORE
+                self.handler(i, LONG)
+            elif state == WAIT and ticks_diff(now, self.since[i]) >= self.double_ms:
+                self.state[i] = IDLE
+                self.handler(i, CLICK)
+    def down(self, i, t):
+        """
+        Button i was pressed at t
+        """
+        if self.state[i] == WAIT:
+            if ticks_diff(t, self.since[i]) < self.double_ms:
+                self.state[i] = IGNORE
+                self.handler(i, DOUBLE)
+                return
+            self.handler(i, CLICK)
+        self.state[i] = DOWN
+        self.since[i] = t
+    def up(self, i, t):
+        """
+        Button i was released at t
+        """
+        state = self.state[i]
+        self.state[i] = IDLE
+        if state != DOWN:
+            return
+        if ticks_diff(t, self.since[i]) >= self.long_ms:
+            self.handler(i, LONG)
+        elif self.double_ms > 0:
+            self.state[i] = WAIT
+            self.since[i] = t
+        else:
+            self.handler(i, CLICK)
@@ -0,0 +1,97 @@
+"""
+Dual core double buffered rendering for the pico
+
+The pico has two cores. With this the second core runs mode.update()
+to draw frame N+1 into the back buffer while the first core writes
+frame N from the front buffer through the output stage to the LEDs
+and does the housekeeping.
+
+At the frame boundary, if the second core has finished, the buffers
+are swapped and it is started on the next frame. The LEDs are only
+written if the new frame differs from the last one. If the second
+core hasn't finished nothing is written so the LED write is never
+late.
+
+After each swap the new front buffer is copied to the back buffer so
+modes which only change some of the LEDs each frame still work. Modes
+don't need to know about any of this.
+"""
+
+import _thread
+from time import ticks_us, ticks_diff
+
+class DualCore:
+    """
+    Runs mirror.update_mode() on the second core
+
+    leds is the Strips (or a NeoPixel) and output the Output which
+    writes the front buffer into leds.buf. mirror.buf is the back
+    buffer the modes draw into.
+    """
+    def __init__(self, mirror, leds, output):
+        self.mirror = mirror
+        self.leds = leds
+        self.output = output
+        self.front = bytearray(len(mirror.buf))
+        # go is released to start the second core on a frame
+        self.go = _thread.allocate_lock()
+        self.go.acquire()
+        # done is released by the second core when the frame is drawn
+        self.done = _thread.allocate_lock()
+        self.done.acquire()
+        self.running = False
+        self.render_us = 0              # last mode.update() on the second core
+        self.render_max_us = 0          # longest mode.update() on the second core
+        self.late = 0                   # frames the second core wasn't ready for
+    def start(self):
+        """
+        Start the second core drawing the first frame
+        """
+        self.running = True
+        _thread.start_new_thread(self.core1, ())
+        self.go.release()
+    def core1(self):
+        """
+        Draw frames on the second core when told to
+        """
+        while True:
+            self.go.acquire()
+            start = ticks_us()
+            self.mirror.update_mode()
+            took = ticks_diff(ticks_us(), start)
+            self.render_us = took
+            if took > self.render_max_us:
+                self.render_max_us = took
+            self.done.release()
+    def frame(self):
+        """
+        Swap the buffers if the next frame is ready then write the LEDs
+        if it or the brightness has changed
+        """
+        if not self.done.acquire(0):
+            self.late += 1
+            return
+        mirror = self.mirror
+        # Sample the knobs here on the first core, as the ADC is shared
+        # with the temperature sensor read by the housekeeping
+        mirror.knobs.sample()
+        mirror.buf, self.front = self.front, mirror.buf
+        changed = mirror.buf != self.front
+        if changed:
+            memoryview(mirror.buf)[:] = self.front
+        self.go.release()
+        if changed or self.output.changed:
+            self.output.apply(self.front, self.leds.buf)
+            self.leds.write()
+    def pause(self):
+        """
+        Wait for the second core to finish drawing so the mode can be changed
+        """
+        if self.running:
+            self.done.acquire()
+    def resume(self):
+        """
+        Start the second core drawing again after pause()
+        """
+        if self.running:
+            self.go.release()
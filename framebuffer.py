@@ -0,0 +1,93 @@
+"""
+Framebuffer for the LEDs
+"""
+
+class Framebuffer:
+    """
+    Contiguous framebuffer for n LEDs
+
+    The colours are stored in buf, a bytearray with 3 bytes (r, g, b)
+    per LED at full brightness. On the pico the output stage copies it
+    to the LEDs applying the brightness and gamma.
+    """
+    def __init__(self, n, buf=None):
+        if buf is None:
+            buf = bytearray(3*n)
+        self.n = n
+        self.buf = buf
+    def __setitem__(self, index, value):
+        """
+        We use mirror[0] = color to set colours
+        """
+        if index < 0 or index >= self.n:
+            return
+        i = 3*index
+        buf = self.buf
+        buf[i], buf[i+1], buf[i+2] = value
+    def __getitem__(self, index):
+        """
+        Read the value set back
+        """
+        if index < 0 or index >= self.n:
+            return (0,0,0)
+        i = 3*index
+        buf = self.buf
+        return (buf[i], buf[i+1], buf[i+2])
+    def fill(self, col):
+        """
+        Set all the LEDs to col
+        """
+        self.fill_range(0, self.n, col)
+    def fill_range(self, start, end, col):
+        """
+        Set the LEDs from start up to but not including end to col
+        """
+        start = max(start, 0)
+        end = min(end, self.n)
+        if start >= end:
+            return
+        buf = memoryview(self.buf)[3*start:3*end]
+        buf[0], buf[1], buf[2] = col
+        # Double the filled area each time round
+        done, size = 3, len(buf)
+        while done < size:
+            k = min(done, size - done)
+            buf[done:done+k] = buf[0:k]
+            done += k
+    def set_range(self, start, cols):
+        """
+        Set the LEDs from start onwards to the colours in cols
+        """
+        buf = self.buf
+        i = 3*start
+        for col in cols:
+            if i >= 3*self.n:
+                break
+            if i >= 0:
+                buf[i], buf[i+1], buf[i+2] = col
+            i += 3
+    def blit(self, data, offset=0):
+        """
+        Copy data, raw bytes of (r, g, b), into the LEDs starting at LED offset
+        """
+        data = memoryview(data)
+        start = 3*offset
+        if start < 0:
+            data = data[-start:]
+            start = 0
+        end = min(start + len(data), 3*self.n)
+        if start >= end:
+            return
+        memoryview(self.buf)[start:end] = data[:end-start]
+    def scale(self, brightness):
+        """
+        Scale all the LEDs by brightness 0..1 in place
+        """
+        s = int(brightness*256)
+        if s >= 256:
+            return
+        if s < 0:
+            s = 0
+        buf = self.buf
+        for i in range(3*self.n):
+            buf[i] = (buf[i] * s) >> 8
@@ -0,0 +1,155 @@
+"""
+Append only state journal for the mirror
+
+The state is a dictionary of keys to values which can be stored as
+JSON. Changes are kept in memory until flush() is called, which
+appends a line for each changed key to the end of the journal file.
+Loading replays the file so the last value of each key wins.
+
+Appending a few short lines writes much less flash than rewriting the
+whole state each time. Once the file grows past max_size, the next
+flush() compacts it. Compacting writes just the current state to a
+new file and renames it over the journal.
+
+Each line is
+
+    cccc key value
+
+where cccc is a checksum of "key value" in hex. Lines whose checksum
+doesn't match are ignored, so if the power fails half way through an
+append only that change is lost.
+
+If filename is None the journal is only kept in memory.
+"""
+
+import os
+import json
+
+def checksum(s):
+    """
+    Return a 16 bit checksum of the string s
+    """
+    c = 0
+    for ch in s:
+        c = (c * 31 + ord(ch)) & 0xFFFF
+    return c
+
+def record(key, value):
+    """
+    Return the journal line for key and value
+    """
+    body = key + " " + json.dumps(value)
+    return "%04x %s\n" % (checksum(body), body)
+
+def parse(line):
+    """
+    Return (key, value) from a journal line or None if it is damaged
+    """
+    line = line.rstrip("\n")
+    if len(line) < 6 or line[4] != " ":
+        return None
+    body = line[5:]
+    try:
+        c = int(line[:4], 16)
+    except ValueError:
+        return None
+    if c != checksum(body):
+        return None
+    i = body.find(" ")
+    if i < 0:
+        return None
+    try:
+        return body[:i], json.loads(body[i+1:])
+    except ValueError:
+        return None
+
+class Journal:
+    """
+    Persistent key value state stored in an append only file
+    """
+    def __init__(self, filename, max_size=4096):
+        self.filename = filename
+        self.max_size = max_size
+        self.state = {}
+        self.dirty = []                 # keys changed since the last flush
+        self.size = 0                   # bytes in the file
+        self.torn = False               # the last line of the file is incomplete
+        self.appends = 0
+        self.compactions = 0
+        self.load()
+    def load(self):
+        """
+        Replay the journal file into the state
+        """
+        if self.filename is None:
+            return
+        try:
+            with open(self.filename) as f:
+                for line in f:
+                    self.size += len(line)
+                    self.torn = not line.endswith("\n")
+                    r = parse(line)
+                    if r:
+                        self.state[r[0]] = r[1]
+        except OSError:
+            pass
+    def exists(self):
+        """
+        Returns True if the journal file has anything in it
+        """
+        return self.size > 0
+    def get(self, key, default=None):
+        """
+        Return the value of key or default if not set
+        """
+        return self.state.get(key, default)
+    def set(self, key, value):
+        """
+        Set key to value, to be written by the next flush()
+
+        key must not contain spaces.
+        """
+        if key in self.state and self.state[key] == value:
+            return
+        self.state[key] = value
+        if key not in self.dirty:
+            self.dirty.append(key)
+    def flush(self):
+        """
+        Write the changes since the last flush to the file
+
+        This appends to the file, or compacts it if it has got too big.
+        Returns True if anything was written.
+        """
+        if not self.dirty:
+            return False
+        if self.filename is None:
+            self.dirty = []
+            return False
+        if self.size >= self.max_size:
+            self.compact()
+            return True
+        data = "".join(record(key, self.state[key]) for key in self.dirty)
+        if self.torn:
+            # Finish the damaged line so it doesn't swallow this one
+            data = "\n" + data
+            self.torn = False
+        with open(self.filename, "a") as f:
+            f.write(data)
+        self.size += len(data)
+        self.dirty = []
+        self.appends += 1
+        return True
+    def compact(self):
+        """
+        Rewrite the file with just the current state
+        """
+        tmp = self.filename + ".tmp"
+        data = "".join(record(key, self.state[key]) for key in self.state)
+        with open(tmp, "w") as f:
+            f.write(data)
+        os.rename(tmp, self.filename)
+        self.size = len(data)
+        self.torn = False
+        self.dirty = []
+        self.compactions += 1
@@ -0,0 +1,80 @@
+"""
+Knob sampling for the mirror
+
+The knobs are read once per frame by the mirror rather than by the
+modes. Each reading is oversampled and low passed, and the value the
+modes see only moves when the reading has moved by more than the
+hysteresis so it doesn't jitter. The values are cached so the modes
+can read them as often as they like for free, and `changed` is set
+when any of them has moved so modes can skip work when they haven't.
+
+The filtering is all integer as the pico has no floating point unit.
+"""
+
+# ADC guard band
+adc_min = 512
+adc_max = 65526-adc_min
+
+class Knobs:
+    """
+    Cached, filtered readings of n knobs
+
+    read(i) returns the raw reading of knob i as 0..65535. Each sample
+    averages oversample readings then low passes them with a time
+    constant of approx 2**shift samples. The cached value only moves
+    when the filtered reading moves by more than hysteresis.
+    """
+    def __init__(self, read, n=3, oversample=4, shift=2, hysteresis=128):
+        self.read = read
+        self.n = n
+        self.oversample = oversample
+        self.shift = shift
+        self.hysteresis = hysteresis
+        self.filtered = [0] * n         # low passed readings
+        self.raw = [0] * n              # filtered reading of each value
+        self.value = [0.0] * n          # value of each knob 0..1
+        self.changed = True             # set when a value moves
+        self.reset()
+    def reset(self):
+        """
+        Read the knobs afresh without filtering
+        """
+        for i in range(self.n):
+            x = self.average(i)
+            self.filtered[i] = x
+            self.set(i, x)
+    def average(self, i):
+        """
+        Return the average of oversample readings of knob i
+        """
+        total = 0
+        for _ in range(self.oversample):
+            total += self.read(i)
+        return total // self.oversample
+    def set(self, i, x):
+        """
+        Set the value of knob i from filtered reading x
+        """
+        self.raw[i] = x
+        v = (x - adc_min) / (adc_max - adc_min)
+        if v < 0:
+            v = 0.0
+        if v > 1.0:
+            v = 1.0
+        if v != self.value[i]:
+            self.value[i] = v
+            self.changed = True
+    def sample(self):
+        """
+        Read all the knobs and update their values - call once per frame
+
+        This sets changed if any of the values moved. It is up to the
+        caller to clear it.
+        """
+        for i in range(self.n):
+            f = self.filtered[i]
+            f += (self.average(i) - f) >> self.shift
+            self.filtered[i] = f
+            d = f - self.raw[i]
+            if d > self.hysteresis or d < -self.hysteresis:
+                self.set(i, f)
@@ -0,0 +1,47 @@
+"""
+LED layout of the mirror
+
+The layout is described in layout.json which is read by the pico and
+the simulator so they agree on how many LEDs there are and where.
+
+- width, height - size of the mirror in mm
+- hleds, hpadding - LEDs along the top and bottom and the gap at each end
+- vleds, vpadding - LEDs up each side and the gap at each end
+- strips - the LED strips in order, each with its data pin and number
+  of LEDs
+
+The LEDs run anticlockwise from the bottom left corner: along the
+bottom, up the right, along the top and down the left. The strips are
+joined end to end into one index space, so with strips of 160 and 160
+LEDs, LED 160 is the first LED of the second strip.
+"""
+
+import json
+
+layout_file = "layout.json"
+
+class Layout:
+    """
+    The LED layout read from a layout file
+    """
+    def __init__(self, config):
+        self.width = config["width"]
+        self.height = config["height"]
+        self.hleds = config["hleds"]
+        self.hpadding = config["hpadding"]
+        self.vleds = config["vleds"]
+        self.vpadding = config["vpadding"]
+        self.strips = []                # (pin, first LED, number of LEDs)
+        self.n = 0
+        for strip in config["strips"]:
+            self.strips.append((strip["pin"], self.n, strip["leds"]))
+            self.n += strip["leds"]
+        if self.n != 2*(self.hleds + self.vleds):
+            raise ValueError("layout has %d LEDs on the strips but %d round the edges" % (self.n, 2*(self.hleds + self.vleds)))
+
+def load(path=layout_file):
+    """
+    Read the Layout from path
+    """
+    with open(path) as f:
+        return Layout(json.load(f))
@@ -2,155 +2,201 @@
 Controller for LED based infinity mirror
 """
 
-import time
-from machine import Pin, Timer
-from neopixel import NeoPixel
+import os
+from time import ticks_us, ticks_diff
+from machine import Pin, ADC
+from strips import Strips
+import layout
+from framebuffer import Framebuffer
+from output import Output
+from scheduler import Scheduler
+from timeservice import TimeService
+from dualcore import DualCore
+from knobs import Knobs
+from buttons import Buttons, CLICK, DOUBLE
+from journal import Journal
+from telemetry import Telemetry, UPDATE, WRITE, BUTTONS
 import modes
 import secrets
 import network
-import ntptime
 
 # Constants
-nleds = 34
-pin = Pin(0)
 update_freq_hz = 25             # how often we update the LEDs
+dual_core = False               # draw the next frame on the second core
+pio_output = False              # send the LEDs with PIO and DMA without blocking
+gamma = 2.2                     # gamma correction for the LEDs
 
 # TZ is the base timezone offset from UTC in hours, 0 for UK, 1 for Europe etc.
 TZ = 0
 
-# ADC guard band
-adc_min = 512
-adc_max = 65526-adc_min
+# The NTP server - an IP address here saves a DNS lookup which blocks
+ntp_host = "pool.ntp.org"
 
 # Control buttons
-buttons = (
+button_pins = (
     Pin(20, Pin.IN, Pin.PULL_UP),
     Pin(21, Pin.IN, Pin.PULL_UP),
 )
 
 # Where to save the current state
-state_file = "state.txt"
+state_file = "state.jnl"
+
+# The old state file which is moved into the journal
+old_state_file = "state.txt"
 
 # Wait this long before saving the file after changes
 save_after_delay = update_freq_hz * 5
 
-def local_time_offset():
-    """
-    Return the daylight savings time offset in hours for UK & Europe.
-
-    This is incorrect for US.
+# Read the temperature sensor every this many frames
+temperature_every = 5
 
-    Adapted from: https://forum.micropython.org/viewtopic.php?f=2&t=4034 by JumpZero
-    """
-    year = time.localtime()[0]              # get current year
-    HHMarch   = time.mktime((year,3 ,(31-(int(5*year/4+4))%7),1,0,0,0,0,0)) # Time of March change to Summer Time
-    HHOctober = time.mktime((year,10,(31-(int(5*year/4+1))%7),1,0,0,0,0,0)) # Time of October change to Winter Time
-    now = time.time()
-    if now < HHMarch :                    # we are before last sunday of March
-        offset = 0
-    elif now < HHOctober :                # we are before last sunday of October
-        offset = 1
-    else:                                 # we are after last sunday of October
-        offset = 0
-    return offset
-
-class Mirror:
+class Mirror(Framebuffer):
     """
     Infinity Mirror with LEDs
     """
     def __init__(self):
-        self._leds = NeoPixel(pin, nleds)
-        self._leds.ORDER = (0, 1, 2, 3) # R G B W
-        self.n = nleds
-        self.adc = [ machine.ADC(i) for i in range (5) ]
+        self.layout = layout.load()
+        nleds = self.layout.n
+        self._leds = Strips(self.layout, pio_output)
+        # The modes draw at full brightness and the output stage
+        # applies the brightness and gamma on the way to the strips
+        self.output = Output(gamma)
+        Framebuffer.__init__(self, nleds)
+        if dual_core:
+            # Draw into a back buffer on the second core
+            self.dual = DualCore(self, self._leds, self.output)
+        else:
+            self.dual = None
+        self.frame_max_us = 0
+        self.sent = bytearray(3*nleds)  # the frame last written to the LEDs
+        self.hold = 0                   # frames to leave the mode alone for
+        self.telemetry = Telemetry(len(modes.MODES))
+        self.adc = [ ADC(i) for i in range (5) ]
+        self.knobs = Knobs(lambda i: self.adc[i].read_u16())
         self.mode = None
-        self.load_state()
-        self.buttons_state = [1, 1]
-        self.buttons_pressed = [False, False]
         self.save_counter = 0
+        self.load_state()
+        self.buttons = Buttons(self.button, len(button_pins), button_pins)
+        # Read now so temperature() never touches the ADC from a mode
         self.temp = None
+        self.read_temperature()
         self.wlan = network.WLAN(network.STA_IF)
         self.wlan.active(True)
         self.wlan.connect(secrets.SSID, secrets.PASSWORD)
-        self.time_set = False
-        self.time_offset = 0
-    def __setitem__(self, index, value):
+        self.clock = TimeService(self.wlan, secrets.SSID, secrets.PASSWORD, tz=TZ, host=ntp_host)
+        if self.dual:
+            self.dual.start()
+    def frame(self):
         """
-        We use mirror[0] = color to set colours
+        Show the last frame on the LEDs then draw the next one
+
+        This is run on every tick of the frame timer so the LEDs are
+        written at a steady rate.
         """
-        if index < 0 or index >= self.n:
-            return
-        self._leds[index] = value
-    def __getitem__(self, index):
+        start = ticks_us()
+        self.output.set_brightness(self.knob_brightness())
+        if self.dual:
+            self.dual.frame()
+            written = ticks_diff(ticks_us(), start)
+            # The update ran on the second core
+            self.telemetry.add(UPDATE, self.dual.render_us)
+        else:
+            # Only write the LEDs if the frame or brightness has changed
+            if self.buf != self.sent or self.output.changed:
+                self.output.apply(self.buf, self._leds.buf)
+                self._leds.write()
+                memoryview(self.sent)[:] = self.buf
+            written = ticks_diff(ticks_us(), start)
+            self.knobs.sample()
+            self.update_mode()
+            self.telemetry.add(UPDATE, ticks_diff(ticks_us(), start) - written)
+        self.telemetry.add(WRITE, written)
+        took = ticks_diff(ticks_us(), start)
+        if took > self.frame_max_us:
+            self.frame_max_us = took
+    def update_mode(self):
         """
-        Read the value set back
+        Run mode.update() unless it asked to be left alone this frame
+
+        Modes can set INTERVAL to the number of frames between updates
+        and can return the number of frames until the next update from
+        update(), otherwise they are updated every frame.
+
+        The knobs are sampled by frame() and knobs_changed() stays set
+        until the mode has been updated. With dual_core this runs on the
+        second core, so it mustn't touch the ADC, which is shared by all
+        its channels.
         """
-        if index < 0 or index >= self.n:
-            return (0,0,0)
-        return self._leds[index]
-    def fill(self, col):
+        if self.hold > 0:
+            self.hold -= 1
+            return
+        frames = self.mode.update()
+        self.knobs.changed = False
+        if not frames:
+            frames = self.mode_interval
+        self.hold = frames - 1
+    def report_headroom(self):
         """
-        Set all the LEDs to col
+        Print the worst time left in a frame while running the current mode
         """
-        for i in range(self.n):
-            self._leds[i] = col
-    def read_buttons(self):
+        if self.mode is None:
+            return
+        busy = self.frame_max_us
+        if self.dual:
+            busy = max(busy, self.dual.render_max_us)
+            self.dual.render_max_us = 0
+        print("Headroom for %s: %.1f ms" % (self.mode.NAME, (1000000 // update_freq_hz - busy) / 1000))
+        self.frame_max_us = 0
+    def poll_buttons(self):
         """
-        Read the state of the buttons to self.buttons_pressed
+        Handle the button events since the last frame
         """
-        for i in range(len(buttons)):
-            old = self.buttons_state[i]
-            new = buttons[i].value()
-            self.buttons_pressed[i] = (old == 0 and new != 0)
-            self.buttons_state[i] = new
-    def update(self, t=None):
+        self.buttons.poll()
+    def button(self, i, event):
         """
-        Update the LEDs
+        Button i sent event
 
-        Returns the desired delay
+        The mode gets the first look at the event if it has a button()
+        method, otherwise button 0 moves forward a mode and button 1
+        back, two modes at a time for a double press.
+        """
+        handler = getattr(self.mode, "button", None)
+        if handler and handler(i, event):
+            return
+        step = 1 if i == 0 else -1
+        if event == CLICK:
+            self.set_mode(self.mode_number + step)
+        elif event == DOUBLE:
+            self.set_mode(self.mode_number + 2*step)
+    def check_save(self):
+        """
+        Save the state after it has stopped changing
         """
-        self.mode.update()
-        self._leds.write()
-        self.read_buttons()
-        if self.buttons_pressed[0]:
-            self.set_mode(self.mode_number + 1)
-        elif self.buttons_pressed[1]:
-            self.set_mode(self.mode_number - 1)
-        # Save the state after it has stopped changing
         if self.save_counter > 0:
             self.save_counter -= 1
             if self.save_counter == 0:
                 self.save_state()
-        # Set the time if unset
-        if not self.time_set and self.wlan.isconnected():
-            try:
-                ntptime.settime()
-            except Exception as e:
-                print("Failed to set time:", e)
-                return
-            self.time_set = True
-            self.time_offset = local_time_offset() + TZ*3600
-            print("UTC Time:   %s" % (time.localtime(),))
-            print("Local Time: %s" % (self.local_time(),))
     def local_time(self):
         """
         Returns the broken down local time
         """
-        if not self.time_set:
+        t = self.clock.localtime()
+        if t is None:
             return (2023, 1, 1, 0, 0, 0, 0, 0, 0)
-        now = time.time()
-        return time.localtime(now+self.time_offset)
+        return t
     def knob(self, i):
         """
-        Read the ADC as a floating point number 0..1
+        Returns the value of knob i as a floating point number 0..1
+
+        This is sampled once per frame so is cheap to call.
+        """
+        return self.knobs.value[i]
+    def knobs_changed(self):
         """
-        x = self.adc[i].read_u16() - adc_min
-        x = x / float(adc_max - adc_min)
-        if x < 0:
-            x = 0.0
-        if x > 1.0:
-            x = 1.0
-        return x
+        Returns True if any of the knobs have moved since the mode was
+        last updated
+        """
+        return self.knobs.changed
     def knob_brightness(self):
         """
         Brightness knob
@@ -166,9 +212,9 @@ class Mirror:
         Speed knob
         """
         return self.knob(2)
-    def temperature(self):
+    def read_temperature(self):
         """
-        Return the temperature of the board in C as a floating point number
+        Read the temperature sensor into self.temp
         """
         volts = 3.3 * self.adc[4].read_u16() / 65536
         temp = 27 - (volts - 0.706)/0.001721
@@ -176,59 +222,110 @@ class Mirror:
             self.temp = temp
         else:
             # Low pass the temperature with a time constant of approx one second
-            self.temp = (self.temp * (update_freq_hz - 1) + temp) / update_freq_hz
+            rate = update_freq_hz // temperature_every
+            self.temp = (self.temp * (rate - 1) + temp) / rate
+    def temperature(self):
+        """
+        Return the temperature of the board in C as a floating point number
+        """
         return self.temp
     def set_mode(self, i):
         """
         Runs the mode given
         """
+        if self.dual:
+            self.dual.pause()
+        self.report_headroom()
         i %= len(modes.MODES)
+        if self.mode is not None:
+            # Let the old mode release anything it holds, eg sockets
+            close = getattr(self.mode, "close", None)
+            if close:
+                close()
+        if self.mode is not None and i != self.mode_number:
+            # Free the old mode before loading the new one
+            self.snapshot_knobs()
+            self.mode = None
+            modes.unload(self.mode_number)
         self.mode_number = i
-        self.mode = modes.MODES[i](self)
+        self.telemetry.mode = i
+        self.mode = modes.load(i)(self)
+        self.mode_interval = getattr(self.mode, "INTERVAL", 1)
+        self.hold = 0
+        self.knobs.changed = True
         print(self.mode.NAME)
         self.save_counter = save_after_delay
+        if self.dual:
+            self.dual.resume()
     def load_state(self):
         """
-        Load the state from a file
+        Load the state from the journal
+        """
+        self.journal = Journal(state_file)
+        if not self.journal.exists():
+            self.migrate_state()
+        print("Loaded state")
+        self.set_mode(self.journal.get("mode", 0))
+    def migrate_state(self):
+        """
+        Move the state from the old state file into the journal
         """
-        mode = 0
         try:
-            with open(state_file) as f:
-                mode = int(f.read())
+            with open(old_state_file) as f:
+                self.journal.set("mode", int(f.read()))
+            self.journal.flush()
+            os.remove(old_state_file)
+            print("Moved state from", old_state_file)
         except Exception as e:
             print("Error reading file", e)
-        self.saved_state = mode
-        print("Loaded state")
-        self.set_mode(mode)
     def save_state(self):
         """
-        Save the state to a file
+        Write the changes to the state to the journal
         """
-        if self.saved_state == self.mode_number:
-            return
+        self.snapshot_knobs()
+        self.journal.set("mode", self.mode_number)
         try:
-            with open(state_file, "w") as f:
-                f.write(str(self.mode_number))
+            if self.journal.flush():
+                print("Saved state")
         except Exception as e:
             print("Error writing file", e)
-        self.saved_state = self.mode_number
-        print("Saved state")
+    def setting_key(self, name):
+        """
+        Returns the journal key for setting name of the current mode
+        """
+        return modes.MODES[self.mode_number] + "." + name
+    def load_setting(self, name, default=None):
+        """
+        Returns the saved setting name of the current mode or default
+        """
+        return self.journal.get(self.setting_key(name), default)
+    def save_setting(self, name, value):
+        """
+        Save setting name of the current mode
+
+        It is written to flash by the housekeeping a few seconds later.
+        """
+        self.journal.set(self.setting_key(name), value)
+        if self.save_counter == 0:
+            self.save_counter = save_after_delay
+    def snapshot_knobs(self):
+        """
+        Remember where the knobs were for the current mode
+        """
+        self.journal.set(self.setting_key("knobs"), [round(v, 3) for v in self.knobs.value])
 
 def main():
+    # Globals so they can be inspected from the REPL
+    global mirror, scheduler, telemetry
     mirror = Mirror()
-    # Update the mirror at update_freq_hz
-    tick_interval = int(1000/update_freq_hz)
-    next_tick = time.ticks_add(time.ticks_ms(), tick_interval)
-    while True:
-        mirror.update()
-        now = time.ticks_ms()
-        sleep_time = time.ticks_diff(next_tick, now)
-        if sleep_time < 0:
-            print("Dropped frame by", -sleep_time, "ms")
-            next_tick = now
-        else:
-            time.sleep_ms(sleep_time)
-        next_tick = time.ticks_add(next_tick, tick_interval)
+    telemetry = mirror.telemetry
+    # Update the mirror at update_freq_hz with the housekeeping in the gaps
+    scheduler = Scheduler(update_freq_hz, mirror.frame, telemetry)
+    scheduler.add("buttons", mirror.poll_buttons, budget_ms=1, phase=BUTTONS)
+    scheduler.add("temperature", mirror.read_temperature, every=temperature_every, slot=1, budget_ms=1)
+    scheduler.add("save", mirror.check_save, budget_ms=20)
+    scheduler.add("ntp", mirror.clock.poll, every=5, slot=2, budget_ms=2)
+    scheduler.run()
 
 if __name__ == "__main__":
     main()
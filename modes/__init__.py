@@ -1,39 +1,45 @@
-MODES = []
-
-from .prey import Mode
-MODES.append(Mode)
-
-from .chasergb import Mode
-MODES.append(Mode)
-
-from .matrix import Mode
-MODES.append(Mode)
-
-from .colour_temp_lights import Mode
-MODES.append(Mode)
-
-from .hsv_lights import Mode
-MODES.append(Mode)
-
-from .hsvwaves import Mode
-MODES.append(Mode)
-
-from .led_test import Mode
-MODES.append(Mode)
-
-from .softglow import Mode
-MODES.append(Mode)
-
-from .hsv_spin import Mode
-MODES.append(Mode)
-
-from .christmas import Mode
-MODES.append(Mode)
-
-from .temperature import Mode
-MODES.append(Mode)
-
-from .time import Mode
-MODES.append(Mode)
-
-del Mode
+"""
+The display modes
+
+MODES lists the module of each mode in the order they are shown. A
+mode's module is only imported when load() selects it, and unload()
+forgets it again so the pico only has the running mode in memory.
+"""
+
+import sys
+import gc
+
+MODES = (
+    "prey",
+    "chasergb",
+    "matrix",
+    "colour_temp_lights",
+    "hsv_lights",
+    "hsvwaves",
+    "led_test",
+    "softglow",
+    "hsv_spin",
+    "christmas",
+    "temperature",
+    "time",
+    "playback",
+    "ddp",
+)
+
+def load(i):
+    """
+    Import mode i returning its Mode class
+    """
+    module = __import__(__name__ + "." + MODES[i], None, None, ("Mode",))
+    return module.Mode
+
+def unload(i):
+    """
+    Forget mode i so the memory it used can be reclaimed
+    """
+    name = MODES[i]
+    sys.modules.pop(__name__ + "." + name, None)
+    g = globals()
+    if name in g:
+        del g[name]
+    gc.collect()
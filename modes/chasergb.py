@@ -1,45 +1,38 @@
 import random
+from array import array
+from .particles import Particles, decay
+
+# Colour of each kind of chaser, 256 is full intensity
+colours = array("H", (256, 0, 0, 0, 256, 0, 0, 0, 256))
 
-class Chaser:
-    def __init__(self, mirror):
-        self.mirror = mirror
-        self.pos = random.randrange(0, self.mirror.n)
-        self.intensity = 1
-        self.speed = (random.random() + 0.1) * random.choice((-1,1))
-        self.type = random.randrange(0,3)
-        self.fade = 0.89 + random.random() / 10.0
-    def update(self, speed):
-        self.intensity *= self.fade
-        if self.intensity < 0.1:
-            return False
-        self.pos += self.speed * (speed + 0.5)
-        if self.pos >= self.mirror.n:
-            self.pos -= self.mirror.n
-        if self.pos < 0:
-            self.pos += self.mirror.n
-        return True
-    
 class Mode:
     NAME = "Chase RGB"
     def __init__(self, mirror):
         self.mirror = mirror
-        self.i = 0
-        self.tick = 0
-        self.chasers = []
-        self.c = [[0,0,0] for i in range(self.mirror.n)]
+        self.chasers = Particles(mirror.n, 4)
+        # The fading trails left by the chasers, 256 is full intensity
+        self.c = array("H", bytes(2*3*mirror.n))
+    def spawn(self):
+        """
+        Start a new chaser
+        """
+        self.chasers.spawn(
+            random.randrange(0, self.mirror.n),
+            vel=(random.random() + 0.1) * random.choice((-1,1)),
+            fade=0.89 + random.random() / 10.0,
+            kind=random.randrange(0,3),
+        )
     def update(self):
-        hue, speed, bright = self.mirror.knob_hue(), self.mirror.knob_speed(), self.mirror.knob_brightness()
-        self.mirror.fill((0,0,0))
-        if len(self.chasers) < 4:
-            self.chasers.append(Chaser(self.mirror))
-        c2 = []
-        for chaser in self.chasers:
-            if chaser.update(speed):
-                c2.append(chaser)
-            self.c[int(chaser.pos)][chaser.type] += chaser.intensity
-        b = bright * 256
-        for i, c in enumerate(self.c):
-            self.mirror[i] = int(min(255,(c[0] * b))),int(min(255,(c[1] * b))),int(min(255,(c[2] * b)))
-            for j in range(3):
-                self.c[i][j] *= (0.89 + hue / 10.0)
-        self.chasers = c2
+        hue, speed = self.mirror.knob_hue(), self.mirror.knob_speed()
+        chasers = self.chasers
+        if chasers.count < chasers.capacity:
+            self.spawn()
+        chasers.age(0.1)
+        chasers.move(speed + 0.5)
+        c = self.c
+        chasers.splat(c, colours, 65535)
+        buf = self.mirror.buf
+        for i in range(len(c)):
+            x = c[i]
+            buf[i] = x if x < 255 else 255
+        decay(c, int((0.89 + hue / 10.0) * 256))
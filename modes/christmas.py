@@ -1,39 +1,39 @@
-from .utils import hsv_to_rgb, byte_scale_rgb
-from math import sin, pi
+from .utils import hsv_to_rgb_into, hue16
+from .trig import sin2, PHASE_PER_RADIAN
 import random
 
 class Mode:
     NAME = "Christmas"
     def __init__(self, mirror):
         self.mirror = mirror
-        self.angle = [ 2*pi*random.random() for i in range(self.mirror.n) ]
-        self.speed = [ random.random() for i in range(self.mirror.n) ]
-        self.hsv = [ self.col() for i in range(self.mirror.n) ]
+        # Angles are phases 0..65535
+        self.angle = [ random.randrange(65536) for i in range(self.mirror.n) ]
+        # Phase step per frame at a speed of 1
+        self.speed = [ int((1+random.random())/50*PHASE_PER_RADIAN) for i in range(self.mirror.n) ]
+        self.hue = [ self.col() for i in range(self.mirror.n) ]
     def col(self):
         """
-        Pick a random christmassy (h, s, v)
+        Pick a random christmassy hue 0..65535
         """
         if random.random() < 0.3:
             # Red range from actual LEDs
             h = random.uniform(0.0, 0.04)
-            s = 1.0
         else:
             # Green range from actual LEDs
             h = random.uniform(0.25, 0.33)
-            s = 1.0
-        return (h, s, 1.0)
+        return hue16(h)
     def update(self):
         """
         Update mirror with the current state
         """
-        brightness = self.mirror.knob_brightness()
-        speed = self.mirror.knob_speed()*2.5+0.5
+        # speed 0.5..3.0 as 128..768
+        speed = int((self.mirror.knob_speed()*2.5+0.5)*256)
+        buf = self.mirror.buf
         for i in range(self.mirror.n):
-            h, s, v = self.hsv[i]
-            v = brightness * (sin(self.angle[i])**2)
-            self.mirror[i] = byte_scale_rgb(hsv_to_rgb(h, s, v))
+            v = sin2(self.angle[i]) >> 8
+            hsv_to_rgb_into(buf, 3*i, self.hue[i], 255, v)
         for i in range(self.mirror.n):
-            self.angle[i] += (1+self.speed[i])/50*speed
-            if self.angle[i] > 2*pi:
-                self.angle[i] -= 2*pi
-                self.hsv[i] = self.col()
+            self.angle[i] += (self.speed[i] * speed) >> 8
+            if self.angle[i] >= 65536:
+                self.angle[i] -= 65536
+                self.hue[i] = self.col()
@@ -1,3 +1,5 @@
+from .utils import byte_scale
+
 # Colour temperatures from http://planetpixelemporium.com/tutorialpages/light.html
 color_temps = (
     ( 1900, (255, 147,  41)), # Candle
@@ -32,15 +34,32 @@ def k_to_rgb(k):
             return (int(r), int(g), int(b))
     return color_temps[-1][1]
 
+# Number of colour temperatures in the gradient the knob picks from
+steps = 256
+
+def gradient():
+    """
+    Returns a palette of steps colours from min_temp to max_temp
+    """
+    buf = bytearray(3*steps)
+    for i in range(steps):
+        r, g, b = k_to_rgb(min_temp + i*(max_temp-min_temp)/(steps-1))
+        buf[3*i] = r
+        buf[3*i+1] = g
+        buf[3*i+2] = b
+    return buf
+
 class Mode:
     NAME = "Lights with controllable colour temperature"
     def __init__(self, mirror):
         self.mirror = mirror
+        self.gradient = gradient()
     def update(self):
         """
         Update mirror with the current state
         """
-        k, v = self.mirror.knob_hue()*(max_temp-min_temp)+min_temp, self.mirror.knob_brightness()
-        r, g, b = k_to_rgb(k)
-        self.mirror.fill((int(r*v), int(g*v), int(b*v)))
-        #print("k=%8.1f r=%3d g=%3d b=%3d" % (k, r, b, g))
+        if not self.mirror.knobs_changed():
+            return
+        i = 3*byte_scale(self.mirror.knob_hue())
+        gradient = self.gradient
+        self.mirror.fill((gradient[i], gradient[i+1], gradient[i+2]))
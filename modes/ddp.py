@@ -0,0 +1,178 @@
+"""
+Show frames streamed over the network with DDP
+
+DDP (Distributed Display Protocol) sends pixel data in UDP packets to
+port 4048 with a 10 byte header
+
+    flags    1 byte   version 1 in the top 2 bits, FLAG_TIMECODE, FLAG_PUSH
+    sequence 1 byte   1..15 in the bottom 4 bits, 0 if not used
+    type     1 byte   data type, ignored as it is always 8 bit RGB here
+    id       1 byte   destination, 1 for the display
+    offset   4 bytes  offset of the data in bytes, big endian
+    length   2 bytes  length of the data in bytes, big endian
+
+followed by a 4 byte timecode if FLAG_TIMECODE is set, then the data,
+3 bytes (r, g, b) per LED. A frame can be split over several packets
+with FLAG_PUSH set on the last one.
+
+The data is copied straight from a preallocated receive buffer into
+mirror.buf. Missing sequence numbers are counted as lost packets. A
+repeat of the last sequence number is a duplicate and a small step
+backwards is a packet which arrived out of order - both are dropped as
+their data is stale, and the late packet is no longer counted as lost.
+
+The timecode is taken to be the sender's clock in ms. The clocks
+aren't synchronised so the latency reported is how much later each
+packet arrived than the quickest one seen, which shows up queueing in
+the network and the sender.
+"""
+
+import socket
+
+try:
+    from time import ticks_ms, ticks_diff
+except ImportError:
+    # CPython
+    import time
+    def ticks_ms():
+        return int(time.monotonic() * 1000) & 0x3FFFFFFF
+    def ticks_diff(a, b):
+        return ((a - b + 0x20000000) & 0x3FFFFFFF) - 0x20000000
+
+PORT = 4048
+HEADER_SIZE = 10
+TIMECODE_SIZE = 4
+MAX_DATA = 1440
+
+VERSION = 0x40
+VERSION_MASK = 0xC0
+FLAG_TIMECODE = 0x10
+FLAG_QUERY = 0x02
+FLAG_PUSH = 0x01
+TYPE_RGB = 0x0B                 # 8 bit RGB
+ID_DISPLAY = 1
+
+# Print the statistics every this many frames
+report_every = 125
+
+# Sequence numbers up to this far behind the last are out of order
+reorder_window = 7
+
+def header(buf, seq, offset, length, push=True, timecode=None):
+    """
+    Write a DDP header into buf returning its size
+    """
+    flags = VERSION
+    if push:
+        flags |= FLAG_PUSH
+    if timecode is not None:
+        flags |= FLAG_TIMECODE
+    buf[0] = flags
+    buf[1] = seq & 0x0F
+    buf[2] = TYPE_RGB
+    buf[3] = ID_DISPLAY
+    buf[4] = (offset >> 24) & 0xFF
+    buf[5] = (offset >> 16) & 0xFF
+    buf[6] = (offset >> 8) & 0xFF
+    buf[7] = offset & 0xFF
+    buf[8] = length >> 8
+    buf[9] = length & 0xFF
+    if timecode is None:
+        return HEADER_SIZE
+    buf[10] = (timecode >> 24) & 0xFF
+    buf[11] = (timecode >> 16) & 0xFF
+    buf[12] = (timecode >> 8) & 0xFF
+    buf[13] = timecode & 0xFF
+    return HEADER_SIZE + TIMECODE_SIZE
+
+class Mode:
+    NAME = "Network frames (DDP)"
+    def __init__(self, mirror, port=PORT):
+        self.mirror = mirror
+        self.packet = bytearray(HEADER_SIZE + TIMECODE_SIZE + MAX_DATA)
+        self.view = memoryview(self.packet)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(socket.getaddrinfo("0.0.0.0", port)[0][-1])
+        self.sock.setblocking(False)
+        # micropython sockets have readinto rather than recv_into
+        self.recv_into = getattr(self.sock, "recv_into", None) or self.sock.readinto
+        self.seq = 0                    # last sequence number seen
+        self.packets = 0
+        self.frames = 0                 # packets with FLAG_PUSH
+        self.lost = 0                   # packets missing from the sequence
+        self.duplicates = 0             # repeats of the last packet
+        self.reordered = 0              # packets which arrived late
+        self.bad = 0                    # packets which weren't understood
+        self.offset = None              # smallest arrival - timecode seen
+        self.latency = 0                # worst latency since the last report
+        self.counter = 0
+        mirror.fill((0,0,0))
+    def close(self):
+        """
+        Stop listening
+        """
+        self.sock.close()
+    def receive(self, size):
+        """
+        Copy the packet of size bytes in self.packet into the mirror
+        """
+        packet = self.packet
+        flags = packet[0]
+        if size < HEADER_SIZE or flags & VERSION_MASK != VERSION or flags & FLAG_QUERY:
+            self.bad += 1
+            return
+        seq = packet[1] & 0x0F
+        if seq:
+            if self.seq:
+                step = (seq - self.seq) % 15
+                if step == 0:
+                    self.duplicates += 1
+                    return
+                if step > 15 - 1 - reorder_window:
+                    # Counted as lost when the gap was seen
+                    self.reordered += 1
+                    if self.lost:
+                        self.lost -= 1
+                    return
+                self.lost += step - 1
+            self.seq = seq
+        self.packets += 1
+        start = HEADER_SIZE
+        if flags & FLAG_TIMECODE:
+            start += TIMECODE_SIZE
+            sent = (packet[10] << 24) | (packet[11] << 16) | (packet[12] << 8) | packet[13]
+            self.timecode(sent)
+        offset = (packet[4] << 24) | (packet[5] << 16) | (packet[6] << 8) | packet[7]
+        length = (packet[8] << 8) | packet[9]
+        length = min(length, size - start, len(self.mirror.buf) - offset)
+        if length > 0:
+            memoryview(self.mirror.buf)[offset:offset+length] = self.view[start:start+length]
+        if flags & FLAG_PUSH:
+            self.frames += 1
+    def timecode(self, sent):
+        """
+        Work out the latency from the sender's clock in ms
+        """
+        offset = ticks_diff(ticks_ms(), sent & 0x3FFFFFFF)
+        if self.offset is None or offset < self.offset:
+            self.offset = offset
+        latency = offset - self.offset
+        if latency > self.latency:
+            self.latency = latency
+    def update(self):
+        """
+        Read all the packets which have arrived since the last frame
+        """
+        while True:
+            try:
+                size = self.recv_into(self.packet)
+            except OSError:
+                break
+            if size is None:
+                break
+            self.receive(size)
+        self.counter += 1
+        if self.counter % report_every == 0:
+            print("DDP: %d frames %d packets %d lost %d duplicates %d reordered %d bad latency %d ms" % (self.frames, self.packets, self.lost, self.duplicates, self.reordered, self.bad, self.latency))
+            self.latency = 0
@@ -0,0 +1,165 @@
+"""
+Compact binary file of recorded frames
+
+The file starts with a 10 byte header
+
+    magic    4 bytes  b"MIRF"
+    version  1 byte   1
+    flags    1 byte   FLAG_DELTA if the frames are delta encoded
+    n        2 bytes  number of LEDs, little endian
+    fps      1 byte   frames per second it was recorded at
+    reserved 1 byte   0
+
+If the frames aren't delta encoded then each frame is 3*n bytes of
+(r, g, b), so 102 bytes per frame for 34 LEDs.
+
+If they are delta encoded each frame is a 2 byte little endian length
+followed by that many bytes of runs. Each run is
+
+    skip     1 byte   number of unchanged LEDs to skip over
+    count    1 byte   number of changed LEDs which follow
+    data     3*count bytes of (r, g, b)
+
+The first frame is encoded against all the LEDs being off, so an
+unchanged frame is just the 2 byte length of 0.
+"""
+
+MAGIC = b"MIRF"
+VERSION = 1
+HEADER_SIZE = 10
+FLAG_DELTA = 1
+
+def max_record_size(n):
+    """
+    Largest delta encoded frame for n LEDs including the length
+    """
+    return 2 + 3*n + 2*(n // 255 + 1)
+
+class Writer:
+    """
+    Write frames of n LEDs to the open binary file f
+    """
+    def __init__(self, f, n, fps, delta=False):
+        self.f = f
+        self.n = n
+        self.delta = delta
+        self.prev = bytearray(3*n)
+        f.write(MAGIC + bytes((VERSION, FLAG_DELTA if delta else 0, n & 0xFF, n >> 8, fps, 0)))
+    def write(self, buf):
+        """
+        Write the frame in buf, 3*n bytes of (r, g, b)
+        """
+        if not self.delta:
+            self.f.write(buf)
+            return
+        runs = self.encode(buf)
+        self.f.write(bytes((len(runs) & 0xFF, len(runs) >> 8)))
+        self.f.write(runs)
+        self.prev[:] = buf
+    def encode(self, buf):
+        """
+        Return the runs of LEDs in buf which differ from the last frame
+        """
+        n = self.n
+        prev = self.prev
+        runs = bytearray()
+        skip = 0
+        i = 0
+        while i < n:
+            if buf[3*i:3*i+3] == prev[3*i:3*i+3]:
+                skip += 1
+                i += 1
+                continue
+            while skip > 255:
+                runs += bytes((255, 0))
+                skip -= 255
+            start = i
+            while i < n and i - start < 255 and buf[3*i:3*i+3] != prev[3*i:3*i+3]:
+                i += 1
+            runs += bytes((skip, i - start))
+            runs += buf[3*start:3*i]
+            skip = 0
+        if len(runs) + 2 > max_record_size(n):
+            # Changes are so scattered a whole frame is smaller
+            runs = bytearray()
+            for start in range(0, n, 255):
+                end = min(start + 255, n)
+                runs += bytes((0, end - start))
+                runs += buf[3*start:3*end]
+        return runs
+
+class Reader:
+    """
+    Read frames from the open binary file f in chunks of chunk_size bytes
+
+    The current frame is kept in frame, 3*n bytes of (r, g, b).
+    """
+    def __init__(self, f, chunk_size=1024):
+        header = f.read(HEADER_SIZE)
+        if len(header) != HEADER_SIZE or header[0:4] != MAGIC or header[4] != VERSION:
+            raise ValueError("not a frame file")
+        self.f = f
+        self.delta = bool(header[5] & FLAG_DELTA)
+        self.n = header[6] | (header[7] << 8)
+        self.fps = header[8]
+        self.frame = bytearray(3*self.n)
+        self.record = bytearray(max_record_size(self.n))
+        self.chunk = bytearray(chunk_size)
+        self.chunk_mv = memoryview(self.chunk)
+        self.pos = 0
+        self.len = 0
+    def read_into(self, mv):
+        """
+        Fill memoryview mv from the file returning False at the end
+        """
+        done = 0
+        size = len(mv)
+        while done < size:
+            if self.pos >= self.len:
+                self.len = self.f.readinto(self.chunk)
+                self.pos = 0
+                if not self.len:
+                    return False
+            k = min(size - done, self.len - self.pos)
+            mv[done:done+k] = self.chunk_mv[self.pos:self.pos+k]
+            self.pos += k
+            done += k
+        return True
+    def next(self):
+        """
+        Read the next frame into frame returning False at the end
+
+        A damaged delta record is treated as the end of the file.
+        """
+        if not self.delta:
+            return self.read_into(memoryview(self.frame))
+        record = memoryview(self.record)
+        if not self.read_into(record[0:2]):
+            return False
+        size = self.record[0] | (self.record[1] << 8)
+        if size > len(self.record) or not self.read_into(record[0:size]):
+            return False
+        frame = memoryview(self.frame)
+        i = 0
+        led = 0
+        while i < size:
+            if i + 2 > size:
+                return False
+            led += record[i]
+            count = record[i+1]
+            i += 2
+            if i + 3*count > size or led + count > self.n:
+                return False
+            frame[3*led:3*(led+count)] = record[i:i+3*count]
+            led += count
+            i += 3*count
+        return True
+    def rewind(self):
+        """
+        Go back to the first frame
+        """
+        self.f.seek(HEADER_SIZE)
+        self.pos = 0
+        self.len = 0
+        for i in range(len(self.frame)):
+            self.frame[i] = 0
@@ -0,0 +1,96 @@
+"""
+Where the LEDs are
+
+X, Y and ANGLE give the position in mm and the angle in degrees
+clockwise from the top of each LED. They are generated from the
+simulator's layout into geometry_data.py so the pico and the
+simulator use the same numbers.
+
+Angles passed to the functions here are phases like modes/trig.py,
+0..65535 for a full circle clockwise from the top. They are looked up
+in tables with BINS entries so there is no searching.
+
+Modes which use these should call check(mirror.n) first so a
+geometry_data.py left over from another layout isn't used.
+"""
+
+from array import array
+from .geometry_data import WIDTH, HEIGHT, X, Y, ANGLE
+
+N = len(ANGLE)
+
+BINS = 1024
+SHIFT = 6                       # phase >> SHIFT is the bin
+
+# LED numbers only need a byte each on mirrors with up to 256 LEDs
+_size = 1 if N <= 256 else 2
+
+def _table():
+    """
+    Returns an array of BINS LED numbers
+    """
+    return array("B" if _size == 1 else "H", bytes(_size * BINS))
+
+NEAREST = _table()              # nearest LED to each bin
+LOWER = _table()                # LED at or anticlockwise of each bin
+UPPER = _table()                # next LED clockwise
+WEIGHT = bytearray(BINS)        # weight of UPPER out of 256
+
+def _build():
+    """
+    Fill in the lookup tables from ANGLE
+    """
+    order = sorted(range(N), key=lambda i: ANGLE[i])
+    k = -1                      # index in order of the lower LED, -1 wraps round
+    for b in range(BINS):
+        angle = b * 360 / BINS
+        while k + 1 < N and ANGLE[order[k + 1]] <= angle:
+            k += 1
+        lower = order[k]
+        upper = order[(k + 1) % N]
+        span = (ANGLE[upper] - ANGLE[lower]) % 360
+        w = int(256 * ((angle - ANGLE[lower]) % 360) / span) if span else 0
+        if w > 255:
+            w = 255
+        LOWER[b] = lower
+        UPPER[b] = upper
+        WEIGHT[b] = w
+        NEAREST[b] = upper if w >= 128 else lower
+
+_build()
+
+def check(n):
+    """
+    Raise ValueError unless the geometry is for a mirror with n LEDs
+    """
+    if n != N:
+        raise ValueError("modes/geometry_data.py has %d LEDs but the mirror has %d - run sim.py --geometry" % (N, n))
+
+def nearest(phase):
+    """
+    Returns the LED nearest the angle phase
+    """
+    return NEAREST[(phase & 0xFFFF) >> SHIFT]
+
+def _add(buf, i, r, g, b, w):
+    """
+    Add (r, g, b) scaled by w/256 to the colour at buf[i] saturating at 255
+    """
+    x = buf[i] + (r * w >> 8)
+    buf[i] = x if x < 255 else 255
+    x = buf[i+1] + (g * w >> 8)
+    buf[i+1] = x if x < 255 else 255
+    x = buf[i+2] + (b * w >> 8)
+    buf[i+2] = x if x < 255 else 255
+
+def spread(buf, phase, r, g, b):
+    """
+    Add the colour (r, g, b) at the angle phase into buf, a mirror.buf
+
+    The colour is split between the two LEDs either side of the angle
+    by how close each is.
+    """
+    i = (phase & 0xFFFF) >> SHIFT
+    w = WEIGHT[i]
+    _add(buf, 3*UPPER[i], r, g, b, w)
+    _add(buf, 3*LOWER[i], r, g, b, 256 - w)
@@ -0,0 +1,121 @@
+"""
+LED geometry of the mirror
+
+Generated by `python3 sim.py --geometry` from the layout in
+layout.json - don't edit by hand. Use modes/geometry.py to read it.
+"""
+
+WIDTH = 300
+HEIGHT = 504
+
+# Position of each LED in mm from the top left
+X = (
+    37.0,
+    82.2,
+    127.4,
+    172.6,
+    217.8,
+    263.0,
+    300.0,
+    300.0,
+    300.0,
+    300.0,
+    300.0,
+    300.0,
+    300.0,
+    300.0,
+    300.0,
+    300.0,
+    300.0,
+    263.0,
+    217.8,
+    172.6,
+    127.4,
+    82.2,
+    37.0,
+    0.0,
+    0.0,
+    0.0,
+    0.0,
+    0.0,
+    0.0,
+    0.0,
+    0.0,
+    0.0,
+    0.0,
+    0.0,
+)
+Y = (
+    504.0,
+    504.0,
+    504.0,
+    504.0,
+    504.0,
+    504.0,
+    470.0,
+    426.4,
+    382.8,
+    339.2,
+    295.6,
+    252.0,
+    208.4,
+    164.8,
+    121.2,
+    77.6,
+    34.0,
+    0.0,
+    0.0,
+    0.0,
+    0.0,
+    0.0,
+    0.0,
+    34.0,
+    77.6,
+    121.2,
+    164.8,
+    208.4,
+    252.0,
+    295.6,
+    339.2,
+    382.8,
+    426.4,
+    470.0,
+)
+
+# Angle of each LED in degrees clockwise from the top
+ANGLE = (
+    204.2,
+    195.1,
+    185.1,
+    174.9,
+    164.9,
+    155.8,
+    145.5,
+    139.3,
+    131.1,
+    120.2,
+    106.2,
+    90.0,
+    73.8,
+    59.8,
+    48.9,
+    40.7,
+    34.5,
+    24.2,
+    15.1,
+    5.1,
+    354.9,
+    344.9,
+    335.8,
+    325.5,
+    319.3,
+    311.1,
+    300.2,
+    286.2,
+    270.0,
+    253.8,
+    239.8,
+    228.9,
+    220.7,
+    214.5,
+)
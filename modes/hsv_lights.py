@@ -1,14 +1,14 @@
-from .utils import hsv_to_rgb, byte_scale_rgb
+from .utils import hsv_to_rgb8, hue16, byte_scale
 
 class Mode:
-    NAME = "HSV lights with the 3 knobs"
+    NAME = "HSV lights with the knobs"
     def __init__(self, mirror):
         self.mirror = mirror
     def update(self):
         """
         Update mirror with the current state
         """
-        h, s, v = self.mirror.knob_hue(), self.mirror.knob_speed(), self.mirror.knob_brightness()
-        r, g, b = hsv_to_rgb(h, s, v)
-        self.mirror.fill(byte_scale_rgb((r, g, b)))
-        #print("r=%5.2f g=%5.2f b=%5.2f h=%5.2f s=%5.2f v=%5.2f" % (r, b, g, h, s, v))
+        if not self.mirror.knobs_changed():
+            return
+        h, s = self.mirror.knob_hue(), self.mirror.knob_speed()
+        self.mirror.fill(hsv_to_rgb8(hue16(h), byte_scale(s), 255))
@@ -1,25 +1,20 @@
-from .utils import hsv_to_rgb
-from math import sin, pi
+from .utils import hsv_to_rgb_into, byte_scale
 
 class Mode:
     NAME = "HSV spin"
     def __init__(self, mirror):
         self.mirror = mirror
-        self.t = 0
+        self.t = 0 # hue offset 0..65535
     def update(self):
         """
         Update mirror with the current state
         """
-        v = self.mirror.knob_brightness()
-        s = self.mirror.knob_hue()
+        s = byte_scale(self.mirror.knob_hue())
         speed = self.mirror.knob_speed()
-        speed = speed*speed*0.1
-        for i in range(self.mirror.n):
-            h = i / self.mirror.n + self.t
-            if h > 1.0:
-                h -= 1.0
-            r, g, b = hsv_to_rgb(h, s, v)
-            self.mirror[i] = (int(255*r), int(255*g), int(255*b))
-        self.t += speed
-        if self.t > 1.0:
-            self.t -= 1.0
+        speed = int(speed*speed*0.1*65536)
+        buf = self.mirror.buf
+        n = self.mirror.n
+        for i in range(n):
+            h = (i * 65536) // n + self.t
+            hsv_to_rgb_into(buf, 3*i, h, s, 255)
+        self.t = (self.t + speed) & 0xFFFF
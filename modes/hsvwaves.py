@@ -1,40 +1,37 @@
-from .utils import hsv_to_rgb
-from math import sin, pi
+from .utils import hsv_to_rgb_into
+from .trig import sin2, phase, PHASE_PER_RADIAN
 
 class Mode:
     NAME = "HSV Waves"
     def __init__(self, mirror):
         self.mirror = mirror
-        self.t = 0
         self.h_multiplier = 3.123456
         self.s_multiplier = 7.398173
         self.v_multiplier = 5.393495
+        # Angles are phases 0..65535
         self.h_angle = 0
         self.s_angle = 0
         self.v_angle = 0
-    def hsv(self, offset, brightness):
-        h = (sin(self.h_angle + offset*self.h_multiplier)**2)
-        s = (sin(self.s_angle + offset*self.s_multiplier)**2)
-        v = (0.75*((sin(self.v_angle + offset*self.v_multiplier)**2))+0.25) * brightness 
-        r, g, b = hsv_to_rgb(h, s, v)
-        return (int(255*r), int(255*g), int(255*b))
+        # Phase step between LEDs
+        self.h_step = phase(0.02*self.h_multiplier)
+        self.s_step = phase(0.02*self.s_multiplier)
+        self.v_step = phase(0.02*self.v_multiplier)
+    def hsv(self, buf, i):
+        """
+        Write the colour of LED i into buf
+        """
+        h = sin2(self.h_angle + i*self.h_step)
+        s = sin2(self.s_angle + i*self.s_step) >> 8
+        v = (((3*sin2(self.v_angle + i*self.v_step)) >> 2) + 16384) >> 8
+        hsv_to_rgb_into(buf, 3*i, h, s, v)
     def update(self):
         """
         Update mirror with the current state
         """
-        brightness = self.mirror.knob_brightness()
-        speed = self.mirror.knob_speed()*0.01
+        speed = self.mirror.knob_speed()*0.01*PHASE_PER_RADIAN
+        buf = self.mirror.buf
         for i in range(self.mirror.n):
-            self.mirror[i] = self.hsv(0.02*i, brightness)
-        self.h_angle += self.h_multiplier * speed
-        if self.h_angle > 2*pi:
-            self.h_angle -= 2*pi
-        self.s_angle += self.s_multiplier * speed
-        if self.s_angle > 2*pi:
-            self.s_angle -= 2*pi
-        self.v_angle += self.v_multiplier * speed
-        if self.v_angle > 2*pi:
-            self.v_angle -= 2*pi
-        self.t += 0.003
-        if self.t > 2*pi:
-            self.t -= 2*pi
+            self.hsv(buf, i)
+        self.h_angle = (self.h_angle + int(self.h_multiplier * speed)) & 0xFFFF
+        self.s_angle = (self.s_angle + int(self.s_multiplier * speed)) & 0xFFFF
+        self.v_angle = (self.v_angle + int(self.v_multiplier * speed)) & 0xFFFF
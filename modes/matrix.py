@@ -1,32 +1,56 @@
 import random
+from array import array
+from .particles import Particles, decay
+from .geometry import N, X, Y, HEIGHT, check
+
+# Colour of the drops
+green = array("B", (0, 255, 0))
+
+# The LEDs along the top and bottom, right to left and left to right
+top = [i for i in range(N) if Y[i] == 0]
+bottom = [i for i in range(N) if Y[i] == HEIGHT]
+
+# Where each drop starts and which way it falls - from the top of the
+# left side downwards and from the top of the right side downwards
+starts = (((top[-1] + 1) % N, 1), ((top[0] - 1) % N, -1))
+
+# How many LEDs a drop falls - the height of a side
+fall = sum(1 for x in X if x == 0)
 
 class Mode:
     NAME = "Matrix"
     def __init__(self, mirror):
+        check(mirror.n)
         self.mirror = mirror
-        self.i = 0
         self.tick = 0
-        self.y = [0,0]
-        self.s = [0,0]
-        self.c = [0] * self.mirror.n
+        self.drops = Particles(mirror.n, len(starts))
+        for i in range(len(starts)):
+            self.drops.spawn(0)
+            self.drop(i)
+        # The fading trails left by the drops
+        self.c = bytearray(3*mirror.n)
+    def drop(self, i):
+        """
+        Start drop i falling from the top again at a random speed
+        """
+        start, direction = starts[i]
+        drops = self.drops
+        drops.pos[i] = start
+        drops.vel[i] = direction * (random.random()*4+1) * fall / 100
     def update(self):
-        hue, speed, bright = self.mirror.knob_hue(), self.mirror.knob_speed(), self.mirror.knob_brightness()
-        self.mirror.fill((0,0,0))
-        for i in range(2):
-            if self.s[i] == 0 or self.y[i] > 100:
-                self.s[i] = random.random()*4+1
-                self.y[i] = 0
-            y = int(self.y[i] * 11 / 100)
-            if i == 0:
-                y0 = 23 + y
-            else:
-                y0 = 16 - y
-            self.c[y0] = 1
-            self.y[i] += self.s[i] * (speed + 0.2)
+        speed = self.mirror.knob_speed()
+        drops = self.drops
+        c = self.c
+        drops.splat(c, green)
+        scale = speed + 0.2
+        drops.move(scale)
+        for i in range(drops.count):
+            start, direction = starts[i]
+            if ((drops.pos[i] - start) * direction) % drops.n > fall:
+                self.drop(i)
         if self.tick == 0:
-            self.c[random.randint(0,5)] = 1
-            self.c[random.randint(17,22)] = 1
-        for i, c in enumerate(self.c):
-            self.mirror[i] = (0,int(c*255*bright),0)
-            self.c[i] *= 0.95
+            c[3*random.choice(bottom)+1] = 255
+            c[3*random.choice(top)+1] = 255
+        self.mirror.blit(c)
+        decay(c, 243)
         self.tick = (self.tick + 1) % 10
@@ -0,0 +1,133 @@
+"""
+Particles moving round the ring of LEDs
+
+Particles keeps a fixed number of particles in arrays, one array per
+property, rather than an object per particle. Spawning fills in the
+next free slot and killing moves the last particle into the hole, so
+the live particles are always 0..count-1 and nothing is allocated
+once the pool is made.
+
+Positions are in LEDs and wrap round the ring. splat() adds the
+particles into a buffer of (r, g, b) like mirror.buf or a longer
+lived trail the mode fades itself.
+"""
+
+from array import array
+
+class Particles:
+    """
+    A pool of up to capacity particles on a ring of n LEDs
+
+    Each particle has a position and velocity in LEDs, a life which
+    is multiplied by fade each time the particles are aged, a kind
+    which picks its colour and a timer for the mode to use.
+    """
+    def __init__(self, n, capacity):
+        self.n = n
+        self.capacity = capacity
+        self.count = 0
+        self.pos = array("f", bytes(4*capacity))
+        self.vel = array("f", bytes(4*capacity))
+        self.life = array("f", bytes(4*capacity))
+        self.fade = array("f", bytes(4*capacity))
+        self.timer = array("h", bytes(2*capacity))
+        self.kind = bytearray(capacity)
+    def spawn(self, pos, vel=0.0, life=1.0, fade=1.0, kind=0, timer=0):
+        """
+        Add a particle, returning its index or -1 if the pool is full
+        """
+        i = self.count
+        if i >= self.capacity:
+            return -1
+        self.count = i + 1
+        self.pos[i] = self.wrap(pos)
+        self.vel[i] = vel
+        self.life[i] = life
+        self.fade[i] = fade
+        self.kind[i] = kind
+        self.timer[i] = timer
+        return i
+    def kill(self, i):
+        """
+        Remove particle i by moving the last particle into its place
+
+        When killing while looping over the particles, loop backwards.
+        """
+        last = self.count - 1
+        self.count = last
+        if i != last:
+            self.pos[i] = self.pos[last]
+            self.vel[i] = self.vel[last]
+            self.life[i] = self.life[last]
+            self.fade[i] = self.fade[last]
+            self.kind[i] = self.kind[last]
+            self.timer[i] = self.timer[last]
+    def wrap(self, x):
+        """
+        Returns position x wrapped onto the ring
+        """
+        n = self.n
+        if x >= n:
+            x -= n
+        elif x < 0:
+            x += n
+        return x
+    def move(self, scale=1.0):
+        """
+        Move every particle by its velocity times scale
+        """
+        pos = self.pos
+        vel = self.vel
+        n = self.n
+        for i in range(self.count):
+            x = pos[i] + vel[i] * scale
+            if x >= n:
+                x -= n
+            elif x < 0:
+                x += n
+            pos[i] = x
+    def age(self, threshold=0.0):
+        """
+        Fade every particle and kill those whose life is below threshold
+        """
+        life = self.life
+        fade = self.fade
+        for i in range(self.count - 1, -1, -1):
+            x = life[i] * fade[i]
+            life[i] = x
+            if x < threshold:
+                self.kill(i)
+    def led(self, i):
+        """
+        Returns the LED particle i is on
+        """
+        j = int(self.pos[i])
+        return j if j < self.n else 0
+    def splat(self, buf, colours, top=255):
+        """
+        Add each particle into buf, saturating at top
+
+        buf holds (r, g, b) for each LED. The particle adds the colour
+        at 3*kind in colours times its life.
+        """
+        pos = self.pos
+        life = self.life
+        kind = self.kind
+        n = self.n
+        for i in range(self.count):
+            j = int(pos[i])
+            if j >= n:
+                j = 0
+            j *= 3
+            k = 3*kind[i]
+            l = life[i]
+            for c in range(3):
+                x = buf[j+c] + int(colours[k+c] * l)
+                buf[j+c] = x if x < top else top
+
+def decay(buf, f):
+    """
+    Multiply every entry of buf by f/256 in place
+    """
+    for i in range(len(buf)):
+        buf[i] = buf[i] * f >> 8
@@ -0,0 +1,26 @@
+"""
+Plasma drawn with the frame function API
+
+This needs numpy so it only runs in the simulator and isn't in
+MODES. Run it with
+
+    python3 sim.py --frame-mode plasma
+"""
+
+import numpy
+
+# Phase of red, green and blue
+phases = numpy.array((0.0, 2.1, 4.2))
+
+class Mode:
+    NAME = "Plasma (frame function)"
+    def __init__(self, mirror):
+        self.mirror = mirror
+    def frame(self, index, angle, t):
+        """
+        Returns the colours of all the LEDs at time t
+        """
+        speed = self.mirror.knob_speed()*4 + 0.5
+        hue = self.mirror.knob_hue()*2*numpy.pi
+        x = 3*angle + numpy.sin(0.05*index - t) + speed*t + hue
+        return 127.5 + 127.5*numpy.sin(x[:, None] + phases)
@@ -0,0 +1,44 @@
+from .framefile import Reader
+
+# Recorded with python3 sim.py --record playback.mirf
+playback_file = "playback.mirf"
+
+# The rate update() is called at
+update_freq_hz = 25
+
+class Mode:
+    NAME = "Playback recorded frames"
+    def __init__(self, mirror):
+        self.mirror = mirror
+        self.reader = None
+        self.due = 0
+        f = None
+        try:
+            f = open(playback_file, "rb")
+            self.reader = Reader(f)
+        except (OSError, ValueError) as e:
+            print("Can't play", playback_file, e)
+            if f:
+                f.close()
+        self.mirror.fill((0,0,0))
+    def close(self):
+        """
+        Close the file being played
+        """
+        if self.reader is not None:
+            self.reader.f.close()
+            self.reader = None
+    def update(self):
+        """
+        Update mirror with the current state
+        """
+        if self.reader is None:
+            return
+        # Play back at the rate it was recorded
+        self.due += self.reader.fps
+        while self.due >= update_freq_hz:
+            self.due -= update_freq_hz
+            if not self.reader.next():
+                self.reader.rewind()
+                self.reader.next()
+        self.mirror.blit(self.reader.frame)
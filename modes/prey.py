@@ -1,80 +1,74 @@
 import random
+from array import array
+from .particles import Particles
 
-class Prey:
-    def __init__(self, mode):
-        self.mode = mode
-        self.mirror = mode.mirror
-        self.pos = random.randrange(0,self.mirror.n)
-        self.n = 0
-    def update(self):
-        self.n -= 1
-        if self.n <= 0:
-            self.n = random.randrange(1,5)
-            self.d = random.choice((-1,1))
-        self.pos += self.d
-        if self.pos < 0: self.pos += self.mirror.n
-        if self.pos >= self.mirror.n: self.pos -= self.mirror.n
-        dead = False
-        for hunt in self.mode.hunt:
-            if self.pos == hunt.pos:
-                dead = True
-        return not dead
+# Colour of the prey and the hunters
+green = array("B", (0, 255, 0))
+red = array("B", (255, 0, 0))
 
-class Hunt:
-    def __init__(self, mode):
-        self.mode = mode
-        self.mirror = mode.mirror
-        self.pos = random.randrange(0,self.mirror.n)
-        self.n = 0
-    def update(self):
-        self.n -= 1
-        if self.n > 0:
-            return
-        self.n = random.randrange(0,10)
-        dmin = 1000
-        s = 0
-        for prey in self.mode.prey:
-            d1 = (prey.pos - self.pos + self.mirror.n) % self.mirror.n
-            d2 = self.mirror.n - d1
-            if d1 < d2:
-                if d1 < dmin:
-                    dmin = d1
-                    s = 1
-            else:
-                if d2 < dmin:
-                    dmin = d2
-                    s = -1
-        if s:
-            self.pos += s
-            if self.pos < 0: self.pos += self.mirror.n
-            if self.pos >= self.mirror.n: self.pos -= self.mirror.n
-    
 class Mode:
     NAME = "Hunter/Prey"
     def __init__(self, mirror):
         self.mirror = mirror
-        self.i = 0
-        self.tick = 0
-        self.prey = []
-        self.hunt = [ Hunt(self) for i in range(2) ]
+        self.prey = Particles(mirror.n, 4)
+        self.hunt = Particles(mirror.n, 2)
+        for i in range(2):
+            self.hunt.spawn(random.randrange(0, mirror.n))
         self.chance = 1.0
+    def update_prey(self):
+        """
+        Move the prey at random, killing any that land on a hunter
+        """
+        prey = self.prey
+        hunt = self.hunt
+        for i in range(prey.count - 1, -1, -1):
+            prey.timer[i] -= 1
+            if prey.timer[i] <= 0:
+                prey.timer[i] = random.randrange(1,5)
+                prey.vel[i] = random.choice((-1,1))
+            prey.pos[i] = prey.wrap(prey.pos[i] + prey.vel[i])
+            for j in range(hunt.count):
+                if prey.pos[i] == hunt.pos[j]:
+                    prey.kill(i)
+                    self.chance /= 2.0
+                    break
+    def update_hunt(self):
+        """
+        Move each hunter a step towards the nearest prey every so often
+        """
+        prey = self.prey
+        hunt = self.hunt
+        n = self.mirror.n
+        for i in range(hunt.count):
+            hunt.timer[i] -= 1
+            if hunt.timer[i] > 0:
+                continue
+            hunt.timer[i] = random.randrange(0,10)
+            dmin = 1000
+            s = 0
+            for j in range(prey.count):
+                d1 = int(prey.pos[j] - hunt.pos[i] + n) % n
+                d2 = n - d1
+                if d1 < d2:
+                    if d1 < dmin:
+                        dmin = d1
+                        s = 1
+                else:
+                    if d2 < dmin:
+                        dmin = d2
+                        s = -1
+            if s:
+                hunt.pos[i] = hunt.wrap(hunt.pos[i] + s)
     def update(self):
-        hue, speed, bright = self.mirror.knob_hue(), self.mirror.knob_speed(), self.mirror.knob_brightness()
         self.mirror.fill((0,0,0))
-        if len(self.prey) < 4:
-            if random.random() < self.chance or len(self.prey) == 0:
-                self.prey.append(Prey(self))
-        p2 = []
-        for prey in self.prey:
-            self.mirror[prey.pos] = (0,255,0)
-            if prey.update():
-                p2.append(prey)
-            else:
-                self.chance /= 2.0
-        self.prey = p2
-        for hunt in self.hunt:
-            self.mirror[hunt.pos] = (255,0,0)
-            hunt.update()
+        if self.prey.count < self.prey.capacity:
+            if random.random() < self.chance or self.prey.count == 0:
+                self.prey.spawn(random.randrange(0,self.mirror.n))
+        buf = self.mirror.buf
+        self.prey.splat(buf, green)
+        self.update_prey()
+        self.hunt.splat(buf, red)
+        self.update_hunt()
         self.chance *= 1.1
         if self.chance > 1.0:
             self.chance = 1.0
@@ -1,5 +1,8 @@
-import time
-from math import sin, pi
+from .trig import sin, phase
+
+# Phase step per frame and between LEDs
+step = phase(0.003)
+led_step = phase(0.05)
 
 class Mode:
     NAME = "Soft changing glow"
@@ -7,32 +10,31 @@ class Mode:
         self.mirror = mirror
         self.state = 0
         self.t = 0
-        self.delay = 0
-    def scol(self, t, brightness):
-        return (
-            int((sin(3*t)+1)*127*brightness),
-            int((sin(5*t)+1)*127*brightness),
-            int((sin(7*t)+1)*127*brightness),
-        )
+    def scol(self, buf, i, t):
+        """
+        Write the colour at phase t into LED i of buf
+        """
+        i *= 3
+        buf[i] = (sin(3*t)+32767) >> 8
+        buf[i+1] = (sin(5*t)+32767) >> 8
+        buf[i+2] = (sin(7*t)+32767) >> 8
     def update(self):
         """
         Update mirror with the current state
         """
-        if self.delay:
-            self.delay -= 1
-            return
+        # Show each test pattern for about a second
         if self.state == 0:
             self.mirror.fill((255,0,0))
             self.state += 1
-            self.delay = 25
+            return 26
         elif self.state == 1:
             self.mirror.fill((0,255,0))
             self.state += 1
-            self.delay = 25
+            return 26
         elif self.state == 2:
             self.mirror.fill((0,0,255))
             self.state += 1
-            self.delay = 25
+            return 26
         elif self.state == 3:
             for i in range(0, self.mirror.n, 5):
                 self.mirror[i+0] = (255,0,0)
@@ -41,12 +43,9 @@ class Mode:
                 self.mirror[i+3] = (255,255,0)
                 self.mirror[i+4] = (0,255,255)
             self.state += 1
-            self.delay = 25
+            return 26
         else:
-            brightness = self.mirror.knob_brightness()
+            buf = self.mirror.buf
             for i in range(self.mirror.n):
-                self.mirror[i] = self.scol(self.t+0.05*i, brightness)
-            self.t += 0.003
-            if self.t > 2*pi:
-                self.t -= 2*pi
-            #self.delay = 5
+                self.scol(buf, i, self.t+led_step*i)
+            self.t = (self.t + step) & 0xFFFF
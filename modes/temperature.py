@@ -1,10 +1,23 @@
-from .utils import hsv_to_rgb, byte_scale_rgb
+from .utils import hsv_to_rgb_into, hue16
+
+# Hue of the coolest LED
+coolest = hue16(0.653)
 
 class Mode:
     NAME = "Show the temperature"
     def __init__(self, mirror):
         self.mirror = mirror
         self.counter = 0
+        self.gradient = self.build()
+    def build(self):
+        """
+        Returns the gradient from red to blue
+        """
+        n = self.mirror.n
+        buf = bytearray(3*n)
+        for j in range(n):
+            hsv_to_rgb_into(buf, 3*j, (j * coolest) // n, 255, 255)
+        return buf
     def update(self):
         """
         Update mirror with the current state
@@ -12,30 +25,24 @@ class Mode:
         temp = self.mirror.temperature()
         if self.counter % 25 == 0:
             print("%.1f" % temp)
-        s = 1.0
-        v = self.mirror.knob_brightness()
-        
+
         # Colours
         # - Red  0.000 for hottest
         # - Blue 0.653 coolest
         #
         # If temperature is 15.3 degrees, put on 15 LEDs with the 16th one on 0.3 of the time.
-        t0 = int(temp) - 1
-        t1 = t0 + 1
-        dt = temp - 1 - t0
+        lit = int(temp)
+        dt = temp - lit
         count = (self.counter % 25) / 25
-        for i in range(self.mirror.n):
-            j = self.mirror.n - 1 - i
-            h = (j / self.mirror.n) * 0.653
-            r, g, b = hsv_to_rgb(h, s, v)
-            col = byte_scale_rgb((r, g, b))
-            if i == t1:
-                if count < dt:
-                    self.mirror[j] = col
-                else:
-                    self.mirror[j] = (0,0,0)
-            elif i <= t0:
-                self.mirror[j] = col
-            else:
-                self.mirror[j] = (0,0,0)
+        if count < dt:
+            lit += 1
+        n = self.mirror.n
+        if lit < 0:
+            lit = 0
+        if lit > n:
+            lit = n
+        # The LEDs are lit from the top of the gradient down
+        start = n - lit
+        self.mirror.fill_range(0, start, (0, 0, 0))
+        self.mirror.blit(memoryview(self.gradient)[3*start:], start)
         self.counter += 1
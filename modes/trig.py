@@ -0,0 +1,52 @@
+"""
+Table based trigonometry for the display modes
+
+The pico has no floating point unit so math.sin is slow. These use
+integer phases instead of radians where 65536 is a full circle, and
+look the answer up in a table of 1024 entries.
+
+Phases can be added together and multiplied by ints freely - only the
+bottom 16 bits are used.
+"""
+
+from math import pi
+import math
+from array import array
+
+PHASE = 65536                           # a full circle
+PHASE_PER_RADIAN = PHASE / (2*pi)
+
+TABLE_BITS = 10
+TABLE_SIZE = 1 << TABLE_BITS
+_SHIFT = 16 - TABLE_BITS
+_MASK = TABLE_SIZE - 1
+
+# sin scaled to -32767..32767
+SIN = array("h", [ int(round(32767*math.sin(2*pi*i/TABLE_SIZE))) for i in range(TABLE_SIZE) ])
+
+# sin squared scaled to 0..65535
+SIN2 = array("H", [ int(round(65535*math.sin(2*pi*i/TABLE_SIZE)**2)) for i in range(TABLE_SIZE) ])
+
+def phase(radians):
+    """
+    Convert an angle in radians to a phase 0..65535
+    """
+    return int(radians * PHASE_PER_RADIAN) & 0xFFFF
+
+def sin(p):
+    """
+    sin of phase p as an int -32767..32767
+    """
+    return SIN[(p >> _SHIFT) & _MASK]
+
+def cos(p):
+    """
+    cos of phase p as an int -32767..32767
+    """
+    return SIN[((p + 16384) >> _SHIFT) & _MASK]
+
+def sin2(p):
+    """
+    sin squared of phase p as an int 0..65535
+    """
+    return SIN2[(p >> _SHIFT) & _MASK]
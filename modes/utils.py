@@ -20,19 +20,60 @@ def byte_scale_rgb(x):
     r, g, b = x
     return (byte_scale(r), byte_scale(g), byte_scale(b))
 
+# For each of the 6 sectors of the hue circle, which byte of the
+# (r, g, b) output gets v, which gets the ramp between p and v, which
+# gets p, and whether the ramp is falling (q) or rising (t).
+_HSV_SECTORS = (
+    (0, 1, 2, False),
+    (1, 0, 2, True),
+    (1, 2, 0, False),
+    (2, 1, 0, True),
+    (2, 0, 1, False),
+    (0, 2, 1, True),
+)
+
+def hsv_to_rgb_into(buf, i, h, s, v):
+    """
+    Convert integer HSV to RGB bytes written to buf[i:i+3]
+
+    h is the hue 0..65535 for a full circle, s and v are 0..255.
+
+    This uses only integer maths and doesn't allocate so it is quick on
+    the pico which has no FPU. Use i = 3*led to write straight into
+    mirror.buf.
+    """
+    if s == 0:
+        buf[i] = v
+        buf[i+1] = v
+        buf[i+2] = v
+        return
+    h = (h & 0xFFFF) * 6
+    v_at, ramp_at, p_at, falling = _HSV_SECTORS[h >> 16]
+    f = (h >> 8) & 0xFF
+    if not falling:
+        f = 255 - f
+    buf[i+v_at] = v
+    buf[i+ramp_at] = v * (65025 - s * f) // 65025
+    buf[i+p_at] = v * (255 - s) // 255
+
+def hsv_to_rgb8(h, s, v):
+    """
+    Convert integer HSV to an (r, g, b) tuple of ints 0..255
+
+    h is the hue 0..65535 for a full circle, s and v are 0..255.
+    """
+    hsv_to_rgb_into(_rgb, 0, h, s, v)
+    return (_rgb[0], _rgb[1], _rgb[2])
+
+def hue16(h):
+    """
+    Scale a float hue 0..1 into an int 0..65535
+    """
+    return int(h*65536) & 0xFFFF
+
+_rgb = bytearray(3)
+
 def hsv_to_rgb(h, s, v):
     """Convert HSV 0..1 to RGB 0..1"""
-    if s == 0.0: return (v, v, v)
-    i = int(h*6.)
-    if i >= 6:
-        i = 5
-    f = (h*6.)-i
-    p = v*(1.-s)
-    q = v*(1.-s*f)
-    t = v*(1.-s*(1.-f))
-    if i == 0: return (v, t, p)
-    if i == 1: return (q, v, p)
-    if i == 2: return (p, v, t)
-    if i == 3: return (p, q, v)
-    if i == 4: return (t, p, v)
-    if i >= 5: return (v, p, q)
+    hsv_to_rgb_into(_rgb, 0, hue16(h), byte_scale(s), byte_scale(v))
+    return (_rgb[0] / 255, _rgb[1] / 255, _rgb[2] / 255)
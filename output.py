@@ -0,0 +1,52 @@
+"""
+Output stage between the framebuffer and the LEDs
+
+The modes draw at full brightness. On the way to the LEDs each byte
+of the frame is looked up in a 256 entry table which applies the
+brightness knob and gamma correction in one pass, so the modes don't
+have to scale every LED themselves and low brightness isn't stepped.
+
+The gamma curve is kept as 16 bit values so the table can be rebuilt
+with integer maths when the brightness changes.
+"""
+
+from array import array
+
+class Output:
+    """
+    Applies gamma and brightness to a frame on its way to the LEDs
+
+    Use gamma=1 where the display already applies gamma, eg the simulator.
+    """
+    def __init__(self, gamma=2.2):
+        self.curve = array("H", (int(65535 * (i / 255) ** gamma + 0.5) for i in range(256)))
+        self.lut = bytearray(256)
+        self.level = -1                 # brightness 0..255 the lut was built for
+        self.changed = True             # set when the lut changes until the next apply()
+        self.set_brightness(1.0)
+    def set_brightness(self, brightness):
+        """
+        Set the brightness 0..1 rebuilding the lookup table if it has changed
+        """
+        level = int(brightness * 255 + 0.5)
+        if level < 0:
+            level = 0
+        elif level > 255:
+            level = 255
+        if level == self.level:
+            return
+        self.level = level
+        curve = self.curve
+        lut = self.lut
+        scale = level + 1
+        for i in range(256):
+            lut[i] = (curve[i] * scale) >> 16
+        self.changed = True
+    def apply(self, src, dst):
+        """
+        Write the frame in src to dst through the lookup table
+        """
+        lut = self.lut
+        for i in range(len(src)):
+            dst[i] = lut[src[i]]
+        self.changed = False
@@ -0,0 +1,89 @@
+"""
+Non-blocking NeoPixel output using the pico's PIO and DMA
+
+NeoPixel.write() bit bangs the LEDs with the CPU, which takes 30 us
+per LED. PioPixel.write() instead copies buf to a transmit buffer and
+starts a DMA channel feeding it a byte at a time to a PIO state
+machine running the WS2812 program. It returns straight away so the
+next frame can be drawn while the LEDs are being sent.
+
+Each strip needs its own state machine (there are 8) and DMA channel,
+and strips on different state machines are sent in parallel.
+
+Call busy() to see if the last write is still being sent. write()
+waits for the previous write and the latch time so it is always safe
+to call.
+"""
+
+import rp2
+from time import ticks_us, ticks_diff, ticks_add
+
+# Base address of each PIO block and the offset of TXF0 in it
+PIO_BASE = (0x50200000, 0x50300000)
+TXF0 = 0x010
+
+# The LEDs latch the data when the line has been low this long
+latch_us = 300
+
+# Time to send each byte - 8 bits at 800 kHz
+byte_us = 10
+
+@rp2.asm_pio(sideset_init=rp2.PIO.OUT_LOW, out_shiftdir=rp2.PIO.SHIFT_LEFT, autopull=True, pull_thresh=8)
+def ws2812():
+    # 10 cycles per bit at 8 MHz is 800 kHz
+    T1 = 2
+    T2 = 5
+    T3 = 3
+    wrap_target()
+    label("bitloop")
+    out(x, 1)               .side(0)    [T3 - 1]
+    jmp(not_x, "do_zero")   .side(1)    [T1 - 1]
+    jmp("bitloop")          .side(1)    [T2 - 1]
+    label("do_zero")
+    nop()                   .side(0)    [T2 - 1]
+    wrap()
+
+class PioPixel:
+    """
+    n NeoPixels on pin driven by PIO state machine sm (0..7) and DMA
+
+    Like NeoPixel this has buf with 3 bytes per LED sent as is and
+    write(). ORDER is only there to look like a NeoPixel.
+    """
+    ORDER = (0, 1, 2, 3)
+    def __init__(self, pin, n, sm=0):
+        self.n = n
+        self.buf = bytearray(3*n)
+        self.tx = bytearray(3*n)        # the copy of buf being sent
+        self.sm = rp2.StateMachine(sm, ws2812, freq=8000000, sideset_base=pin)
+        self.sm.active(1)
+        # Byte writes to the TX FIFO are copied across the word, so
+        # with a pull threshold of 8 each byte is sent MSB first
+        self.txf = PIO_BASE[sm // 4] + TXF0 + 4*(sm % 4)
+        self.dma = rp2.DMA()
+        self.ctrl = self.dma.pack_ctrl(size=0, inc_read=True, inc_write=False, treq_sel=(sm // 4)*8 + sm % 4)
+        self.done_us = ticks_us()       # when the last bit of the last write is sent
+        self.writes = 0
+        self.waits = 0                  # writes which had to wait for the last one
+    def busy(self):
+        """
+        Returns True if the last write is still being sent
+
+        This polls the DMA and the state machine's FIFO then allows for
+        the last bits still being shifted out and the latch time.
+        """
+        if self.dma.active() or self.sm.tx_fifo():
+            return True
+        return ticks_diff(ticks_us(), self.done_us) < latch_us
+    def write(self):
+        """
+        Start sending buf to the LEDs, returning straight away
+        """
+        if self.busy():
+            self.waits += 1
+            while self.busy():
+                pass
+        memoryview(self.tx)[:] = self.buf
+        self.done_us = ticks_add(ticks_us(), byte_us*len(self.tx))
+        self.writes += 1
+        self.dma.config(read=self.tx, write=self.txf, count=len(self.tx), ctrl=self.ctrl, trigger=True)
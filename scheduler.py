@@ -0,0 +1,144 @@
+"""
+Frame scheduler for the mirror
+
+A hardware timer ticks at the frame rate. On each tick the frame
+function runs first so the LEDs are written at a steady rate. The
+housekeeping tasks (buttons, saving, NTP, temperature) then share out
+the time left before the next tick.
+
+Each task has a period in frames, a slot which staggers it against the
+other tasks with the same period, and a budget in ms. A task which is
+due only runs if its budget fits in the time left before the next
+frame, otherwise it is deferred to the next frame. This stops a slow
+subsystem pushing the LED write past its deadline. A task deferred
+max_deferred frames in a row is run anyway so the buttons, saving and
+NTP still work when the frames are overrunning.
+"""
+
+import time
+import machine
+from telemetry import HOUSEKEEPING
+
+# Run a task regardless of its budget after this many deferrals in a row
+max_deferred = 5
+
+class Task:
+    """
+    A housekeeping task run by the Scheduler
+    """
+    def __init__(self, name, fn, every=1, slot=0, budget_ms=1, phase=HOUSEKEEPING):
+        self.name = name
+        self.fn = fn
+        self.every = every
+        self.budget_ms = budget_ms
+        self.phase = phase              # telemetry phase to add the time to
+        self.due = slot % every         # frames until the task is due
+        self.runs = 0                   # number of times run
+        self.deferred = 0               # number of frames deferred
+        self.waiting = 0                # frames deferred since the last run
+        self.forced = 0                 # number of runs over max_deferred
+        self.overruns = 0               # number of runs over budget
+        self.max_us = 0                 # longest run
+    def run(self):
+        """
+        Run the task, returning how long it took in us
+        """
+        start = time.ticks_us()
+        self.fn()
+        took = time.ticks_diff(time.ticks_us(), start)
+        self.runs += 1
+        self.due = self.every
+        self.waiting = 0
+        if took > self.max_us:
+            self.max_us = took
+        if took > 1000*self.budget_ms:
+            self.overruns += 1
+            print("Task", self.name, "took", took // 1000, "ms, budget", self.budget_ms, "ms")
+        return took
+
+class Scheduler:
+    """
+    Runs frame() at freq_hz from a hardware timer with housekeeping
+    tasks in the gaps
+
+    If telemetry is set the task times are added to it and the frame
+    is ended after the housekeeping.
+    """
+    def __init__(self, freq_hz, frame, telemetry=None):
+        self.freq_hz = freq_hz
+        self.period_ms = 1000 // freq_hz
+        self.frame = frame
+        self.telemetry = telemetry
+        self.tasks = []
+        self.ticks = 0
+        self.frames = 0
+        self.dropped = 0
+        self.timer = None
+    def add(self, name, fn, every=1, slot=0, budget_ms=1, phase=HOUSEKEEPING):
+        """
+        Add a housekeeping task, returning it
+
+        fn() is called every `every` frames, offset by slot frames,
+        provided budget_ms fits in the time left in the frame. Its time
+        is added to the telemetry phase given.
+        """
+        task = Task(name, fn, every, slot, budget_ms, phase)
+        self.tasks.append(task)
+        return task
+    def _tick(self, timer):
+        """
+        Timer callback - counts the frame ticks
+        """
+        self.ticks += 1
+    def wait(self):
+        """
+        Wait for the next tick, returning the deadline for this frame
+        """
+        while self.ticks == self.frames:
+            machine.idle()
+        missed = self.ticks - self.frames - 1
+        if missed > 0:
+            print("Dropped", missed, "frames")
+            self.dropped += missed
+        self.frames = self.ticks
+        return time.ticks_add(time.ticks_ms(), self.period_ms)
+    def housekeeping(self, deadline):
+        """
+        Run the tasks which are due and fit in the time before deadline
+        """
+        for task in self.tasks:
+            task.due -= 1
+            if task.due > 0:
+                continue
+            left = time.ticks_diff(deadline, time.ticks_ms())
+            if task.budget_ms > left:
+                if task.waiting < max_deferred:
+                    task.deferred += 1
+                    task.waiting += 1
+                    continue
+                task.forced += 1
+            took = task.run()
+            if self.telemetry:
+                self.telemetry.add(task.phase, took)
+        if self.telemetry:
+            self.telemetry.end_frame()
+    def run(self):
+        """
+        Run the frames and the tasks forever
+        """
+        self.timer = machine.Timer(mode=machine.Timer.PERIODIC, freq=self.freq_hz, callback=self._tick)
+        try:
+            while True:
+                deadline = self.wait()
+                self.frame()
+                self.housekeeping(deadline)
+        finally:
+            self.timer.deinit()
+    def stats(self):
+        """
+        Print the task statistics - call from the REPL
+        """
+        print("frames %d dropped %d" % (self.frames, self.dropped))
+        print("%-12s %6s %6s %8s %8s %8s %8s" % ("task", "budget", "max", "runs", "deferred", "forced", "overruns"))
+        for task in self.tasks:
+            print("%-12s %6d %6.1f %8d %8d %8d %8d" % (task.name, task.budget_ms, task.max_us / 1000, task.runs, task.deferred, task.forced, task.overruns))
@@ -1,26 +1,57 @@
 #!/usr/bin/env python3
 
+import os
 from os import environ
 environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
 import pygame
 #import pygame.gfxdraw
 import time
+import socket
 import modes
 import math
+from framebuffer import Framebuffer
+from output import Output
+from knobs import Knobs
+from buttons import Buttons, CLICK, DOUBLE
+from journal import Journal
+from modes.framefile import Writer
+from modes import geometry
+from modes import ddp
+import layout
+import argparse
+import multiprocessing
+try:
+    import numpy
+except ImportError:
+    numpy = None
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
 
-# Dimensions measured from the mirror in mm
-# The infinity mirror has 34 LEDs, 11 up each side and 6 on top and bottom
+# The dimensions of the mirror in mm and the number of LEDs are read
+# from the layout file shared with the pico - see layout.py
+layout_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), layout.layout_file)
 
-hleds = 6
-hpadding = 37
-width = 300
+def use_layout(path):
+    """
+    Read the layout from path into the dimensions the simulator uses
+    """
+    global width, height, hleds, hpadding, vleds, vpadding
+    config = layout.load(path)
+    width, height = config.width, config.height
+    hleds, hpadding = config.hleds, config.hpadding
+    vleds, vpadding = config.vleds, config.vpadding
+    return config
 
-vleds = 11
-vpadding = 34
-height = 504
+use_layout(layout_file)
 
 led_width = 5
 
+# Use the reference renderer if the layout is too big to precompute -
+# if 4 bytes per pixel per LED would be bigger than this
+max_images_bytes = 256 << 20
+
 update_freq_hz = 25             # how often we update the LEDs
     
 class LED:
@@ -34,100 +65,306 @@ class LED:
         center_y = height/2
         self.dx = (center_x - self.x)/32
         self.dy = (center_y - self.y)/32
-        #print(self.dx, self.dy)
-        # Print angle of each LED in degrees
-        # angle = 270-360*math.atan2(-self.dy, self.dx)/(2*math.pi)
-        # if angle < 0:
-        #     angle += 360
-        # if angle >= 360:
-        #     angle -= 360
-        # print("%.1f" % angle)
-    def circle(self, surface, col, width, offset_x=0, offset_y=0):
-        img = pygame.Surface((width, width))
-        pygame.draw.circle(img, col, (width/2, width/2), width/2)
-        w = int(width/2+0.5)
-        #pygame.gfxdraw.filled_circle(img, w, w, w-1, col)
-        #pygame.gfxdraw.aacircle(img, w, w, w, col)
-        surface.blit(img, (self.x - width/2 + offset_x, self.y - width/2 + offset_y), special_flags=pygame.BLEND_ADD)
-    def draw(self, surface, col):
+    def angle(self):
+        """
+        Returns the angle of the LED in degrees clockwise from the top
+        """
+        angle = 270-360*math.atan2(-self.dy, self.dx)/(2*math.pi)
+        if angle < 0:
+            angle += 360
+        if angle >= 360:
+            angle -= 360
+        return angle
+    def reflections(self):
+        """
+        Yield (offset_x, offset_y, width, brightness) for each circle
+        making up the image of this LED.
+
+        The geometry is fixed so this is shared by the reference drawing
+        code and the precomputed renderer.
+        """
         size = 1.0
-        gap = 10*size
         brightness = 1.0
-        r, g, b = col
         diffuse_width = width
         diffuse_brightness = 0.04
         # Can see 24 LEDs deep
         # Draw an LED and a diffuse beam for each LED
         for i in range(24):
-            self.circle(surface, (brightness*r, brightness*g, brightness*b), led_width*size*1.4, offset_x=i*self.dx, offset_y=i*self.dy)
+            yield i*self.dx, i*self.dy, led_width*size*1.4, brightness
             if i % 4 == 0:
-                self.circle(surface, (r*brightness*diffuse_brightness, g*brightness*diffuse_brightness, b*brightness*diffuse_brightness), diffuse_width*size, offset_x=i*self.dx, offset_y=i*self.dy)
-                #self.circle(surface, (r*diffuse_brightness, g*diffuse_brightness, b*diffuse_brightness), diffuse_width*size, offset_x=i*self.dx, offset_y=i*self.dy)
+                yield i*self.dx, i*self.dy, diffuse_width*size, brightness*diffuse_brightness
             size *= 0.95
             brightness *= 0.90
         #self.circle(surface, (r*0.1, g*0.1, b*0.1), 30*led_width)
         #self.circle(surface, (r*0.05, g*0.05, b*0.05), height/2)
+    def circle(self, surface, col, width, offset_x=0, offset_y=0):
+        """
+        Add a circle to surface returning the Rect of the pixels changed
+        """
+        img = pygame.Surface((width, width))
+        pygame.draw.circle(img, col, (width/2, width/2), width/2)
+        w = int(width/2+0.5)
+        #pygame.gfxdraw.filled_circle(img, w, w, w-1, col)
+        #pygame.gfxdraw.aacircle(img, w, w, w, col)
+        return surface.blit(img, (self.x - width/2 + offset_x, self.y - width/2 + offset_y), special_flags=pygame.BLEND_ADD)
+    def draw(self, surface, col):
+        """
+        Draw the LED circle by circle - this is the slow reference renderer
+        """
+        r, g, b = col
+        for offset_x, offset_y, w, brightness in self.reflections():
+            self.circle(surface, (brightness*r, brightness*g, brightness*b), w, offset_x=offset_x, offset_y=offset_y)
+    def spans(self, surface):
+        """
+        Yield (brightness, xs, starts, ends) for each circle making up
+        the image of this LED, where the circle covers y = starts..ends-1
+        in each column xs
 
-class Mirror:
+        The circles are drawn with pygame on surface, which must be
+        black and the size of the mirror, so the pixels are exactly the
+        ones the reference renderer draws. surface is left black.
+        """
+        for offset_x, offset_y, w, brightness in self.reflections():
+            rect = self.circle(surface, (255, 255, 255), w, offset_x=offset_x, offset_y=offset_y)
+            if rect.width == 0 or rect.height == 0:
+                continue
+            mask = pygame.surfarray.array_red(surface.subsurface(rect)) != 0
+            surface.fill((0, 0, 0), rect)
+            # +1 where a run of pixels down a column starts, -1 after it ends
+            edges = numpy.diff(numpy.pad(mask, ((0, 0), (1, 1))).astype(numpy.int8), axis=1)
+            xs, starts = numpy.nonzero(edges == 1)
+            _, ends = numpy.nonzero(edges == -1)
+            yield brightness, rect.x + xs, rect.y + starts, rect.y + ends
+
+class Renderer:
+    """
+    Draws the mirror from the precomputed pixels of each circle
+
+    The geometry of the reflections never changes so the pixels each
+    circle of each LED covers are found once at startup, as runs down
+    each column. Each frame the colour of each circle is truncated to
+    an integer as pygame does, added in at the start of its runs and
+    taken off at the end, and the columns summed. This matches the
+    reference renderer exactly.
+    """
+    def __init__(self, leds):
+        self.n = len(leds)
+        surface = pygame.Surface((width, height))
+        brightness = []                 # brightness of each circle
+        owner = []                      # LED of each circle
+        starts = []                     # index in the column sums where each run starts
+        ends = []                       # and ends
+        circles = []                    # circle of each run
+        for i, led in enumerate(leds):
+            for b, xs, y0, y1 in led.spans(surface):
+                circles.append(numpy.full(len(xs), len(brightness)))
+                brightness.append(b)
+                owner.append(i)
+                starts.append(xs*(height+1) + y0)
+                ends.append(xs*(height+1) + y1)
+        self.brightness = numpy.array(brightness)
+        self.owner = numpy.array(owner, dtype=numpy.intp)
+        circle = numpy.concatenate(circles)
+        self.circle = numpy.concatenate((circle, circle))
+        self.sign = numpy.concatenate((numpy.ones(len(circle)), -numpy.ones(len(circle))))[:, None]
+        # Index of each run end for each colour in the column sums
+        index = numpy.concatenate(starts + ends)
+        self.index = (3*index[:, None] + numpy.arange(3)).reshape(-1)
+    def render(self, surface, fb):
+        """
+        Render the colours in the Framebuffer fb onto surface
+        """
+        cols = numpy.frombuffer(fb.buf, dtype=numpy.uint8).reshape(self.n, 3)
+        # Colour of each circle truncated like pygame does
+        levels = numpy.floor(self.brightness[:, None] * cols[self.owner])
+        weights = (levels[self.circle] * self.sign).reshape(-1)
+        pixels = numpy.bincount(self.index, weights, minlength=3*width*(height+1)).reshape(width, height+1, 3)
+        numpy.cumsum(pixels, axis=1, out=pixels)
+        numpy.clip(pixels, 0, 255, out=pixels)
+        pygame.surfarray.blit_array(surface, pixels[:, :height].astype(numpy.uint8))
+
+class ReferenceRenderer:
+    """
+    Draws the mirror circle by circle with pygame
+
+    This is slow but it is the definition of what the mirror should
+    look like.
+    """
+    def __init__(self, leds):
+        self.leds = leds
+    def render(self, surface, fb):
+        """
+        Render the colours in the Framebuffer fb onto surface
+        """
+        for i, led in enumerate(self.leds):
+            led.draw(surface, fb[i])
+
+class DotRenderer:
+    """
+    Draws each LED as a square dot with no reflections
+
+    This is for layouts with too many LEDs to precompute or to draw
+    circle by circle at a usable speed.
+    """
+    def __init__(self, leds, size=3):
+        self.n = len(leds)
+        offsets = numpy.arange(size) - size // 2
+        x = numpy.array([int(led.x) for led in leds])
+        y = numpy.array([int(led.y) for led in leds])
+        # The pixels of each LED's dot as (LED, pixel) arrays
+        self.x = numpy.clip(x[:, None, None] + offsets[None, :, None], 0, width - 1).reshape(self.n, -1)
+        self.y = numpy.clip(y[:, None, None] + offsets[None, None, :], 0, height - 1).reshape(self.n, -1)
+    def render(self, surface, fb):
+        """
+        Render the colours in the Framebuffer fb onto surface
+        """
+        cols = numpy.frombuffer(fb.buf, dtype=numpy.uint8).reshape(self.n, 3)
+        pixels = numpy.zeros((width, height, 3), dtype=numpy.uint8)
+        pixels[self.x, self.y] = cols[:, None, :]
+        pygame.surfarray.blit_array(surface, pixels)
+
+def make_renderer(leds, reference=False, dots=False):
+    """
+    Returns the quickest renderer for leds, or the reference renderer
+
+    If there are too many LEDs to precompute this uses the reference
+    renderer, or the DotRenderer if dots is set.
+    """
+    if reference or numpy is None or 4*width*height*len(leds) > max_images_bytes:
+        if numpy is None:
+            print("numpy not found - using slow reference renderer")
+        elif not reference and dots:
+            print("Too many LEDs to precompute - drawing the LEDs as dots")
+            return DotRenderer(leds)
+        elif not reference:
+            print("Too many LEDs to precompute - using slow reference renderer")
+        return ReferenceRenderer(leds)
+    return Renderer(leds)
+
+def positions():
+    """
+    Returns the position of each LED in the mirror in the correct order
+    from the layout
+    """
+    hspacing = (width - 2*hpadding)/(hleds-1)
+    vspacing = (height - 2*vpadding)/(vleds-1)
+    positions = []
+    for i in range(hleds):
+        positions.append((hspacing * i + hpadding, height))
+    for i in reversed(range(vleds)):
+        positions.append((width, vspacing * i + vpadding))
+    for i in reversed(range(hleds)):
+        positions.append((hspacing * i + hpadding, 0))
+    for i in range(vleds):
+        positions.append((0, vspacing * i + vpadding))
+    return [(round(x, 1), round(y, 1)) for x, y in positions]
+
+def write_geometry(path):
+    """
+    Write the LED geometry module for the modes from positions()
+    """
+    leds = [LED(pos) for pos in positions()]
+    def table(values):
+        return "(\n" + "".join("    %.1f,\n" % v for v in values) + ")"
+    with open(path, "w") as f:
+        f.write('''"""
+LED geometry of the mirror
+
+Generated by `python3 sim.py --geometry` from the layout in
+layout.json - don't edit by hand. Use modes/geometry.py to read it.
+"""
+
+WIDTH = %d
+HEIGHT = %d
+
+# Position of each LED in mm from the top left
+X = %s
+Y = %s
+
+# Angle of each LED in degrees clockwise from the top
+ANGLE = %s
+''' % (width, height, table(led.x for led in leds), table(led.y for led in leds), table(led.angle() for led in leds)))
+    print("Wrote", path)
+
+class Mirror(Framebuffer):
     """
     Infinity Mirror with LEDs
+
+    With render=False there is no renderer so update() can't be used,
+    which saves precomputing the LED images when only the frames are
+    needed. With start=False no mode is started so the caller must
+    start one.
     """
-    def __init__(self):
+    vector = False                      # set by VectorMirror
+    def __init__(self, reference=False, render=True, start=True):
         # LEDs in the mirror in the correct order
-        hspacing = (width - 2*hpadding)/(hleds-1)
-        vspacing = (height - 2*vpadding)/(vleds-1)
-        leds = []
-        for i in range(hleds):
-            leds.append(LED((hspacing * i + hpadding, height)))
-        for i in reversed(range(vleds)):
-            leds.append(LED((width, vspacing * i + vpadding)))
-        for i in reversed(range(hleds)):
-            leds.append(LED((hspacing * i + hpadding, 0)))
-        for i in range(vleds):
-            leds.append(LED((0, vspacing * i + vpadding)))
+        leds = [LED(pos) for pos in positions()]
+        if list(zip(geometry.X, geometry.Y)) != positions():
+            print("modes/geometry_data.py doesn't match the layout - run sim.py --geometry")
         self._leds = leds
-        self.n = len(leds)
-        self._cols = [ (0,0,0) ] * self.n
+        Framebuffer.__init__(self, len(leds))
+        # The screen applies its own gamma so only do the brightness
+        self.output = Output(gamma=1)
+        self.out = Framebuffer(len(leds))
+        self.renderer = make_renderer(leds, reference, self.vector) if render else None
+        self.shown = None               # the frame last drawn on the screen
+        self.hold = 0                   # frames to leave the mode alone for
         self._knob = [0.5, 0.5, 0.5, 0.6]
+        self.knobs = Knobs(lambda i: int(self._knob[i] * 65535))
+        self.buttons = Buttons(self.button)
+        self.journal = Journal(None)
         self.mode = None
-        self.set_mode(0)
-    def __setitem__(self, index, value):
+        if start:
+            self.set_mode(0)
+    def update_mode(self):
         """
-        We use mirror[0] = color to set colurs
+        Run mode.update() unless it asked to be left alone this frame
+
+        Modes can set INTERVAL to the number of frames between updates
+        and can return the number of frames until the next update from
+        update(), otherwise they are updated every frame.
+
+        The knobs are sampled every frame and knobs_changed() stays
+        set until the mode has been updated.
         """
-        if index < 0 or index >= self.n:
+        self.knobs.sample()
+        if self.hold > 0:
+            self.hold -= 1
             return
-        self._cols[index] = value
-    def __getitem__(self, index):
-        """
-        Read the value set back
-        """
-        if index < 0 or index >= self.n:
-            return (0,0,0)
-        return self._cols[index]
-    def fill(self, col):
-        """
-        Set all the LEDs to col
-        """
-        for i in range(self.n):
-            self._cols[i] = col
+        frames = self.mode.update()
+        self.knobs.changed = False
+        if not frames:
+            frames = self.mode_interval
+        self.hold = frames - 1
     def update(self, screen):
         """
         Update the display
 
-        Write the state of the LEDs to the screen
+        Write the state of the LEDs to the screen if they have changed
 
-        Returns the desired delay
+        Returns True if the screen was redrawn
         """
-        delay = self.mode.update()
-        for i in range(self.n):
-            self._leds[i].draw(screen, self._cols[i])
-        return delay
+        self.buttons.poll()
+        self.update_mode()
+        self.output.set_brightness(self.knob_brightness())
+        if self.buf == self.shown and not self.output.changed:
+            return False
+        self.shown = bytes(self.buf)
+        self.output.apply(self.buf, self.out.buf)
+        screen.fill((0,0,0))
+        self.renderer.render(screen, self.out)
+        return True
     def knob(self, i):
         """
-        Reads the value of knob i as 0..1
+        Returns the value of knob i as 0..1
+        """
+        return self.knobs.value[i]
+    def knobs_changed(self):
+        """
+        Returns True if any of the knobs have moved since the mode was
+        last updated
         """
-        return self._knob[i]
+        return self.knobs.changed
     def knob_brightness(self):
         """
         Brightness knob
@@ -147,7 +384,7 @@ class Mirror:
         """
         Return the temperature of the board in C as a floating point number
         """
-        return self.knob(3)*34
+        return self._knob[3]*34
     def add_knob(self, i, delta):
         """
         Changes the value of knob i by delta
@@ -162,25 +399,361 @@ class Mirror:
         Runs the mode given
         """
         i %= len(modes.MODES)
+        if self.mode is not None:
+            # Let the old mode release anything it holds, eg sockets
+            close = getattr(self.mode, "close", None)
+            if close:
+                close()
+        if self.mode is not None and i != self.mode_number:
+            # Free the old mode before loading the new one
+            self.snapshot_knobs()
+            self.mode = None
+            modes.unload(self.mode_number)
         self.mode_number = i
-        self.mode = modes.MODES[i](self)
+        # Put the knobs back where they were for this mode
+        saved = self.load_setting("knobs")
+        if saved:
+            self._knob[:len(saved)] = saved
+            self.knobs.reset()
+        self.mode = modes.load(i)(self)
+        self.mode_interval = getattr(self.mode, "INTERVAL", 1)
+        self.hold = 0
+        self.knobs.changed = True
         print(self.mode.NAME)
-    def press_button(self, i):
+    def button(self, i, event):
         """
-        Received a button press
+        Button i sent event
+
+        The mode gets the first look at the event if it has a button()
+        method, otherwise button 0 moves forward a mode and button 1
+        back, two modes at a time for a double press.
         """
-        if i == 0:
-            self.set_mode(self.mode_number + 1)
-        elif i == 1:
-            self.set_mode(self.mode_number - 1)
+        handler = getattr(self.mode, "button", None)
+        if handler and handler(i, event):
+            return
+        step = 1 if i == 0 else -1
+        if event == CLICK:
+            self.set_mode(self.mode_number + step)
+        elif event == DOUBLE:
+            self.set_mode(self.mode_number + 2*step)
     def local_time(self):
         """
         Returns the broken down local time
         """
         return time.localtime()
+    def setting_key(self, name):
+        """
+        Returns the journal key for setting name of the current mode
+        """
+        return modes.MODES[self.mode_number] + "." + name
+    def load_setting(self, name, default=None):
+        """
+        Returns the saved setting name of the current mode or default
+        """
+        return self.journal.get(self.setting_key(name), default)
+    def save_setting(self, name, value):
+        """
+        Save setting name of the current mode - this is only kept in memory
+        """
+        self.journal.set(self.setting_key(name), value)
+    def snapshot_knobs(self):
+        """
+        Remember where the knobs were for the current mode
+        """
+        self.save_setting("knobs", self._knob[:3])
+
+class Sender:
+    """
+    Send each frame as DDP packets to the mirror's ddp mode
+
+    A frame too big for one packet is split into packets which are sent
+    gap seconds apart so the pico's receive buffers aren't swamped, with
+    the push flag on the last. Each packet has a sequence number so the
+    receiver can count the ones lost.
+
+    With delta only the runs of LEDs which changed are sent, and nothing
+    for an unchanged frame, with the whole frame every keyframe frames
+    in case packets were lost. As each packet costs the pico time to
+    receive, the whole frame is sent if that takes fewer packets.
+    """
+    def __init__(self, address, n, delta=False, gap=0.001, keyframe=25):
+        host, _, port = address.partition(":")
+        self.address = (host, int(port) if port else ddp.PORT)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.n = n
+        self.delta = delta
+        self.gap = gap
+        self.keyframe = keyframe
+        self.prev = bytearray(3*n)
+        self.packet = bytearray(ddp.HEADER_SIZE + ddp.TIMECODE_SIZE + ddp.MAX_DATA)
+        self.seq = 0
+        self.frames = 0
+        self.packets = 0
+        self.bytes = 0
+    def spans(self, buf):
+        """
+        Returns the (start, end) byte ranges of buf to send
+
+        Runs of changed LEDs closer than a header's worth of LEDs are
+        sent as one.
+        """
+        whole = [(0, 3*self.n)]
+        if not self.delta or self.frames % self.keyframe == 0:
+            return whole
+        merge = (ddp.HEADER_SIZE + ddp.TIMECODE_SIZE) // 3 + 1
+        prev = self.prev
+        spans = []
+        start = None
+        last = None
+        for i in range(self.n):
+            j = 3*i
+            if buf[j] == prev[j] and buf[j+1] == prev[j+1] and buf[j+2] == prev[j+2]:
+                continue
+            if start is None:
+                start = i
+            elif i - last > merge:
+                spans.append((3*start, 3*last+3))
+                start = i
+            last = i
+        if start is not None:
+            spans.append((3*start, 3*last+3))
+        if len(spans) > (3*self.n + ddp.MAX_DATA - 1) // ddp.MAX_DATA:
+            return whole
+        return spans
+    def send(self, buf):
+        """
+        Send the frame in buf
+        """
+        chunks = []
+        for start, end in self.spans(buf):
+            for offset in range(start, end, ddp.MAX_DATA):
+                chunks.append((offset, min(offset + ddp.MAX_DATA, end)))
+        self.frames += 1
+        self.prev[:] = buf
+        packet = self.packet
+        for i, (start, end) in enumerate(chunks):
+            if i:
+                time.sleep(self.gap)
+            self.seq = self.seq % 15 + 1
+            timecode = int(time.monotonic() * 1000) & 0xFFFFFFFF
+            size = ddp.header(packet, self.seq, start, end - start, i == len(chunks) - 1, timecode)
+            packet[size:size + end - start] = buf[start:end]
+            size += end - start
+            self.sock.sendto(memoryview(packet)[:size], self.address)
+            self.packets += 1
+            self.bytes += size
+    def close(self):
+        """
+        Print what was sent and close the socket
+        """
+        print("Sent %d frames in %d packets, %d bytes" % (self.frames, self.packets, self.bytes))
+        self.sock.close()
+
+class VectorOutput(Output):
+    """
+    Output stage which applies the lookup table with numpy
+    """
+    def __init__(self, gamma=2.2):
+        Output.__init__(self, gamma)
+        self.table = numpy.frombuffer(self.lut, dtype=numpy.uint8)
+    def apply(self, src, dst):
+        """
+        Write the frame in src to dst through the lookup table
+        """
+        numpy.take(self.table, numpy.frombuffer(src, dtype=numpy.uint8), out=numpy.frombuffer(dst, dtype=numpy.uint8))
+        self.changed = False
+
+class VectorMirror(Mirror):
+    """
+    Mirror with the frame as a numpy array for prototyping big layouts
+
+    frame is an (n, 3) uint8 view of buf, so modes can draw with numpy,
+    and fill() and the output stage are vectorised. Existing modes work
+    unchanged. Layouts with too many LEDs to precompute are drawn as dots.
+
+    A mode can have frame(index, angle, t) instead of update(). It is
+    called with arrays of the LED numbers and their angles in radians
+    clockwise from the top, and the time in seconds since the mode
+    started. It returns the whole frame as an (n, 3) array of 0..255,
+    or draws into mirror.frame itself and returns None.
+    """
+    vector = True
+    def __init__(self, reference=False, render=True, start=True):
+        self.frames = 0                 # frames since the mode started
+        # Don't start a mode until frame is set up for its fill()
+        Mirror.__init__(self, reference, render, start=False)
+        self.frame = numpy.frombuffer(self.buf, dtype=numpy.uint8).reshape(self.n, 3)
+        self.output = VectorOutput(gamma=1)
+        self.index = numpy.arange(self.n)
+        self.angle = numpy.radians([led.angle() for led in self._leds])
+        if start:
+            self.set_mode(0)
+    def update_mode(self):
+        """
+        Run the mode's frame() if it has one, otherwise its update()
+        """
+        frame = getattr(self.mode, "frame", None)
+        if frame is None:
+            Mirror.update_mode(self)
+            return
+        self.knobs.sample()
+        result = frame(self.index, self.angle, self.frames / update_freq_hz)
+        self.knobs.changed = False
+        self.frames += 1
+        if result is not None:
+            self.frame[:] = numpy.clip(result, 0, 255)
+    def set_mode(self, i):
+        """
+        Runs the mode given
+        """
+        self.frames = 0
+        Mirror.set_mode(self, i)
+    def fill(self, col):
+        """
+        Set all the LEDs to col
+        """
+        self.frame[:] = col
+    def fill_range(self, start, end, col):
+        """
+        Set the LEDs from start up to but not including end to col
+        """
+        self.frame[max(start, 0):max(end, 0)] = col
+
+# The renderer in each export worker process
+_renderer = None
+
+def _start_worker(path, reference):
+    """
+    Set up an export worker with the layout and a renderer
+
+    Forked workers inherit the parent's renderer so this only has to
+    build one where processes are spawned.
+    """
+    global _renderer
+    if _renderer is None:
+        use_layout(path)
+        _renderer = make_renderer([LED(pos) for pos in positions()], reference)
+
+def _render_frames(job):
+    """
+    Render job, (first frame number, frames, directory), in a worker
+
+    Writes each frame as a PNG in directory if set, otherwise returns
+    a list of the RGB bytes of each frame.
+    """
+    first, frames, directory = job
+    surface = pygame.Surface((width, height))
+    fb = Framebuffer(len(frames[0]) // 3)
+    images = []
+    for i, frame in enumerate(frames):
+        fb.buf = frame
+        surface.fill((0,0,0))
+        _renderer.render(surface, fb)
+        if directory:
+            pygame.image.save(surface, os.path.join(directory, "%04d.png" % (first + i)))
+        else:
+            images.append(pygame.image.tostring(surface, "RGB"))
+    return images
+
+def run_frames(mode_number, frames, knobs):
+    """
+    Run mode_number for frames with the knobs set returning the frames
+    as they would be shown
+
+    This only runs the mode, which is cheap, leaving the rendering to
+    be done in parallel.
+    """
+    mirror = Mirror(render=False, start=False)
+    # Start the mode directly rather than with set_mode() so the knobs
+    # aren't restored and nothing is printed
+    mirror._knob[:len(knobs)] = knobs
+    mirror.knobs.reset()
+    mirror.mode_number = mode_number
+    mirror.mode = modes.load(mode_number)(mirror)
+    mirror.mode_interval = getattr(mirror.mode, "INTERVAL", 1)
+    mirror.knobs.changed = True
+    shown = []
+    for i in range(frames):
+        mirror.update_mode()
+        mirror.output.set_brightness(mirror.knob_brightness())
+        mirror.output.apply(mirror.buf, mirror.out.buf)
+        shown.append(bytes(mirror.out.buf))
+    close = getattr(mirror.mode, "close", None)
+    if close:
+        close()
+    return shown
+
+def export(directory, names, frames, knobs, fmt, processes, path, reference=False):
+    """
+    Export frames of each of the modes in names to directory without a window
+
+    Writes name.gif or name/NNNN.png for each mode. The modes are run
+    in this process and their frames rendered by a pool of processes.
+    """
+    os.makedirs(directory, exist_ok=True)
+    start = time.time()
+    _start_worker(path, reference)
+    with multiprocessing.Pool(processes, _start_worker, (path, reference)) as pool:
+        for name in names:
+            t = time.time()
+            shown = run_frames(modes.MODES.index(name), frames, knobs)
+            png_dir = None
+            if fmt == "png":
+                png_dir = os.path.join(directory, name)
+                os.makedirs(png_dir, exist_ok=True)
+            # Several chunks per process to even out the load
+            chunk = max(1, -(-frames // (4*processes)))
+            jobs = [(i, shown[i:i+chunk], png_dir) for i in range(0, frames, chunk)]
+            images = []
+            for result in pool.imap(_render_frames, jobs):
+                images.extend(result)
+            if fmt == "gif":
+                pictures = [Image.frombytes("RGB", (width, height), data) for data in images]
+                out = os.path.join(directory, name + ".gif")
+                pictures[0].save(out, save_all=True, append_images=pictures[1:], duration=1000 // update_freq_hz, loop=0)
+            else:
+                out = png_dir
+            print("Exported %s to %s in %.1f s" % (name, out, time.time() - t))
+    print("Exported %d modes in %.1f s" % (len(names), time.time() - start))
 
 def main():
-    print("Click LEFT, RIGHT to change mode")
+    parser = argparse.ArgumentParser(description="Infinity Mirror Simulator")
+    parser.add_argument("--reference", action="store_true", help="use the slow circle by circle renderer")
+    parser.add_argument("--record", metavar="FILE", help="record the frames to FILE for the playback mode")
+    parser.add_argument("--delta", action="store_true", help="delta encode the recorded frames")
+    parser.add_argument("--geometry", action="store_true", help="write the LED geometry to modes/geometry_data.py and exit")
+    parser.add_argument("--layout", metavar="FILE", help="read the LED layout from FILE instead of layout.json")
+    parser.add_argument("--send", metavar="HOST[:PORT]", help="send the frames with DDP to the mirror's ddp mode at HOST")
+    parser.add_argument("--send-delta", action="store_true", help="only send the LEDs which changed")
+    parser.add_argument("--vector", action="store_true", help="use the numpy Mirror - needed for big layouts")
+    parser.add_argument("--frame-mode", metavar="NAME", action="append", help="add the frame function mode modes/NAME.py - implies --vector")
+    parser.add_argument("--fps", type=float, default=update_freq_hz, help="frames per second to run at (default %(default)s)")
+    parser.add_argument("--export", metavar="DIR", help="export frames of the modes to DIR without a window and exit")
+    parser.add_argument("--mode", action="append", choices=modes.MODES, help="mode to export - repeat for more (default all)")
+    parser.add_argument("--frames", type=int, default=100, help="number of frames to export (default %(default)s)")
+    parser.add_argument("--knobs", default="1,0.5,0.5,0.6", help="knobs to export with as brightness,hue,speed,temperature (default %(default)s)")
+    parser.add_argument("--format", choices=("gif", "png"), help="export a GIF or PNG files (default gif if PIL is installed)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="number of processes to render with (default %(default)s)")
+    args = parser.parse_args()
+
+    if args.layout:
+        use_layout(args.layout)
+
+    if args.geometry:
+        write_geometry(os.path.join(os.path.dirname(os.path.abspath(__file__)), "modes", "geometry_data.py"))
+        return
+
+    if args.export:
+        if args.frames < 1:
+            parser.error("--frames must be at least 1")
+        fmt = args.format or ("gif" if Image else "png")
+        if fmt == "gif" and Image is None:
+            parser.error("exporting a GIF needs PIL - pip install pillow")
+        knobs = [float(x) for x in args.knobs.split(",")]
+        export(args.export, args.mode or modes.MODES, args.frames, knobs, fmt, args.processes, args.layout or layout_file, args.reference)
+        return
+
+    print("Click LEFT, RIGHT to change mode, double click to skip one, hold for a long press")
     print("Mouse wheel to change brightness (knob 0)")
     print("SHIFT mouse wheel for hue (knob 1)")
     print("CTRL mouse wheel for speed (knob 2)")
@@ -190,7 +763,24 @@ def main():
     screen = pygame.display.set_mode(size)
     pygame.display.set_caption("Infinity Mirror Simulator")
 
-    mirror = Mirror()
+    if args.frame_mode:
+        # These need numpy so they aren't in MODES for the pico
+        modes.MODES += tuple(args.frame_mode)
+    if args.vector or args.frame_mode:
+        if numpy is None:
+            parser.error("--vector needs numpy")
+        mirror = VectorMirror(reference=args.reference)
+    else:
+        mirror = Mirror(reference=args.reference)
+
+    recording = None
+    if args.record:
+        recording = open(args.record, "wb")
+        writer = Writer(recording, mirror.n, update_freq_hz, delta=args.delta)
+
+    sender = None
+    if args.send:
+        sender = Sender(args.send, mirror.n, delta=args.send_delta)
 
     quit = False
     shift_pressed = False
@@ -206,6 +796,12 @@ def main():
                     shift_pressed = (e.type == pygame.KEYDOWN)
                 elif e.key == pygame.K_LCTRL or e.key == pygame.K_RCTRL:
                     control_pressed = (e.type == pygame.KEYDOWN)
+            if e.type == pygame.MOUSEBUTTONDOWN or e.type == pygame.MOUSEBUTTONUP:
+                pressed = (e.type == pygame.MOUSEBUTTONDOWN)
+                if e.button == 1:
+                    mirror.buttons.edge(0, pressed)
+                elif e.button == 3:
+                    mirror.buttons.edge(1, pressed)
             if e.type == pygame.MOUSEBUTTONDOWN:
                 knob_number = 0
                 if shift_pressed and control_pressed:
@@ -214,25 +810,29 @@ def main():
                     knob_number = 1
                 elif control_pressed:
                     knob_number = 2
-                if e.button == 1:
-                    mirror.press_button(0)
-                elif e.button == 3:
-                    mirror.press_button(1)
-                elif e.button == 4:
+                if e.button == 4:
                     mirror.add_knob(knob_number, 0.05)
                 elif e.button == 5:
                     mirror.add_knob(knob_number, -0.05)
 
-        screen.fill((0,0,0))
-        mirror.update(screen)
-        pygame.display.update()
+        redrawn = mirror.update(screen)
+        if recording:
+            writer.write(mirror.buf)
+        if sender:
+            sender.send(mirror.buf)
+        if redrawn:
+            pygame.display.update()
         dt = time.time() - start
-        delay = 1.0/update_freq_hz - dt
+        delay = 1.0/args.fps - dt
         if delay < 0:
             #print(f"Dropped frame by {-delay*1000:.2f}ms")
             delay = 0
         time.sleep(delay)
 
+    if recording:
+        recording.close()
+    if sender:
+        sender.close()
     pygame.quit()
 
 if __name__ == "__main__":
@@ -0,0 +1,61 @@
+"""
+Several LED strips driven as one
+
+Strips looks like a single NeoPixel with one buf covering all the
+LEDs. Each strip's NeoPixel has a memoryview slice of that buf as its
+own buffer, so nothing is copied when the strips are written.
+
+With pio=True each strip is a PioPixel instead, sent by its own PIO
+state machine and DMA channel. Then write() returns straight away and
+all the strips are sent at the same time.
+"""
+
+from machine import Pin
+from neopixel import NeoPixel
+
+class Strips:
+    """
+    The strips in a Layout as one NeoPixel like object with buf and write()
+    """
+    def __init__(self, layout, pio=False):
+        self.n = layout.n
+        self.strips = []                # (NeoPixel, first LED, number of LEDs)
+        for i, (pin, start, n) in enumerate(layout.strips):
+            if pio:
+                from piopixel import PioPixel
+                leds = PioPixel(Pin(pin), n, i)
+            else:
+                leds = NeoPixel(Pin(pin), n)
+            leds.ORDER = (0, 1, 2, 3)   # R G B W
+            self.strips.append((leds, start, n))
+        self._buf = None
+        self._views = {}                # slices of each buf seen, by id
+        self.buf = bytearray(3*self.n)
+    @property
+    def buf(self):
+        return self._buf
+    @buf.setter
+    def buf(self, buf):
+        # Point each strip at its slice of buf
+        self._buf = buf
+        views = self._views.get(id(buf))
+        if views is None:
+            mv = memoryview(buf)
+            views = [mv[3*start:3*(start+n)] for leds, start, n in self.strips]
+            self._views[id(buf)] = views
+        for i in range(len(self.strips)):
+            self.strips[i][0].buf = views[i]
+    def write(self):
+        """
+        Write all the strips
+        """
+        for leds, start, n in self.strips:
+            leds.write()
+    def busy(self):
+        """
+        Returns True if any strip is still being sent
+        """
+        for leds, start, n in self.strips:
+            if hasattr(leds, "busy") and leds.busy():
+                return True
+        return False
@@ -0,0 +1,117 @@
+"""
+Frame timing telemetry for the mirror
+
+This records how long each phase of every frame took in a fixed size
+ring buffer, and keeps a histogram of the total frame time for each
+mode. It is allocation free once created so it can run all the time.
+
+From the REPL use
+
+    telemetry.summary()         # per phase and per mode summary
+    telemetry.dump()            # every frame in the ring as CSV
+
+to find which mode and which phase is going over the frame budget.
+"""
+
+from array import array
+
+# The phases of a frame
+UPDATE = 0
+WRITE = 1
+BUTTONS = 2
+HOUSEKEEPING = 3
+PHASES = ("update", "write", "buttons", "housekeeping")
+
+bucket_us = 2000                # width of each histogram bucket
+nbuckets = 21                   # the last bucket is 40 ms and over
+
+class Telemetry:
+    """
+    Ring buffer of the last size frame timings with a histogram per mode
+    """
+    def __init__(self, nmodes, size=256):
+        self.nmodes = nmodes
+        self.size = size
+        self.times = array("H", bytes(2*len(PHASES)*size))   # us per phase, saturating
+        self.modes = bytearray(size)                            # mode number of each frame
+        self.hist = array("I", bytes(4*nbuckets*nmodes))       # frame count per mode and bucket
+        self.current = array("I", bytes(4*len(PHASES)))        # us per phase of this frame
+        self.pos = 0
+        self.count = 0
+        self.mode = 0
+    def add(self, phase, us):
+        """
+        Add us to the time taken by phase this frame
+        """
+        self.current[phase] += us
+    def end_frame(self):
+        """
+        Store the timings of this frame and start the next
+        """
+        current = self.current
+        times = self.times
+        i = self.pos * len(PHASES)
+        total = 0
+        for phase in range(len(PHASES)):
+            t = current[phase]
+            total += t
+            times[i + phase] = t if t < 65535 else 65535
+            current[phase] = 0
+        self.modes[self.pos] = self.mode
+        bucket = total // bucket_us
+        if bucket >= nbuckets:
+            bucket = nbuckets - 1
+        self.hist[self.mode * nbuckets + bucket] += 1
+        self.pos += 1
+        if self.pos >= self.size:
+            self.pos = 0
+        if self.count < self.size:
+            self.count += 1
+    def frames(self):
+        """
+        Yield (mode, times) for each frame in the ring, oldest first
+        """
+        start = self.pos - self.count
+        for j in range(self.count):
+            k = (start + j) % self.size
+            i = k * len(PHASES)
+            yield self.modes[k], self.times[i:i+len(PHASES)]
+    def summary(self, names=None):
+        """
+        Print the mean and max of each phase over the ring and the
+        histogram of frame times for each mode
+
+        names is an optional list of mode names to print
+        """
+        print("Last %d frames" % self.count)
+        print("%-12s %8s %8s" % ("phase", "mean us", "max us"))
+        for phase in range(len(PHASES)):
+            total = 0
+            worst = 0
+            for mode, times in self.frames():
+                total += times[phase]
+                worst = max(worst, times[phase])
+            print("%-12s %8d %8d" % (PHASES[phase], total // max(self.count, 1), worst))
+        print("Frame time histogram in %d ms buckets, the last is over budget" % (bucket_us // 1000))
+        for mode in range(self.nmodes):
+            counts = self.hist[mode*nbuckets:(mode+1)*nbuckets]
+            if sum(counts) == 0:
+                continue
+            name = names[mode] if names else ""
+            print("%2d %s" % (mode, name))
+            print("   " + " ".join("%d" % c for c in counts))
+    def dump(self):
+        """
+        Print every frame in the ring as CSV: mode then us for each phase
+        """
+        print("mode," + ",".join(PHASES))
+        for mode, times in self.frames():
+            print("%d,%s" % (mode, ",".join("%d" % t for t in times)))
+    def reset(self):
+        """
+        Clear the ring and the histograms
+        """
+        self.pos = 0
+        self.count = 0
+        for i in range(len(self.hist)):
+            self.hist[i] = 0
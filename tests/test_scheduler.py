@@ -0,0 +1,65 @@
+"""
+Tests for scheduler.py with a fake clock in place of the pico's
+"""
+
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.modules.setdefault("machine", types.ModuleType("machine"))
+
+import scheduler
+
+class Clock:
+    """
+    Stands in for the time module with a clock moved on by hand
+    """
+    def __init__(self):
+        self.us = 0
+    def ticks_us(self):
+        return self.us
+    def ticks_ms(self):
+        return self.us // 1000
+    def ticks_add(self, a, b):
+        return a + b
+    def ticks_diff(self, a, b):
+        return a - b
+
+def run_frames(sched, clock, frames):
+    """
+    Run frames the way Scheduler.run does without the timer
+    """
+    for _ in range(frames):
+        deadline = clock.ticks_add(clock.ticks_ms(), sched.period_ms)
+        sched.frame()
+        sched.housekeeping(deadline)
+
+def test_tasks_run_when_frames_overrun(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(scheduler, "time", clock)
+    def slow_frame():
+        clock.us += 60000
+    sched = scheduler.Scheduler(25, slow_frame)
+    buttons = sched.add("buttons", lambda: None, budget_ms=1)
+    save = sched.add("save", lambda: None, budget_ms=20)
+    ntp = sched.add("ntp", lambda: None, every=5, slot=2, budget_ms=2)
+    frames = 60
+    run_frames(sched, clock, frames)
+    for task in (buttons, save, ntp):
+        assert task.runs > 0
+        assert task.forced == task.runs
+        assert task.waiting <= scheduler.max_deferred
+    assert buttons.runs == frames // (scheduler.max_deferred + 1)
+
+def test_tasks_deferred_only_when_late(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(scheduler, "time", clock)
+    def quick_frame():
+        clock.us += 5000
+    sched = scheduler.Scheduler(25, quick_frame)
+    buttons = sched.add("buttons", lambda: None, budget_ms=1)
+    run_frames(sched, clock, 10)
+    assert buttons.runs == 10
+    assert buttons.deferred == 0
+    assert buttons.forced == 0
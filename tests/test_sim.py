@@ -0,0 +1,45 @@
+"""
+Tests for the simulator's renderers
+"""
+
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+numpy = pytest.importorskip("numpy")
+pygame = pytest.importorskip("pygame")
+
+import sim
+from framebuffer import Framebuffer
+
+# Most the precomputed renderer may differ from the reference by
+max_difference = 2
+
+def render(renderer, fb):
+    """
+    Returns the pixels renderer draws for fb as an int array
+    """
+    surface = pygame.Surface((sim.width, sim.height))
+    renderer.render(surface, fb)
+    return pygame.surfarray.array3d(surface).astype(int)
+
+def test_renderer_matches_reference():
+    leds = [sim.LED(pos) for pos in sim.positions()]
+    fast = sim.Renderer(leds)
+    reference = sim.ReferenceRenderer(leds)
+    fb = Framebuffer(len(leds))
+    rng = numpy.random.default_rng(1)
+    frames = (
+        rng.integers(0, 256, 3*len(leds)),
+        rng.integers(0, 40, 3*len(leds)),
+        numpy.full(3*len(leds), 255),
+        numpy.zeros(3*len(leds)),
+    )
+    for frame in frames:
+        fb.buf[:] = bytes(frame.astype(numpy.uint8))
+        difference = numpy.abs(render(fast, fb) - render(reference, fb))
+        assert difference.max() <= max_difference
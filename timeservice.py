@@ -0,0 +1,278 @@
+"""
+Non-blocking time service for the mirror
+
+This keeps the WiFi connected and the time set from NTP without
+holding up the frame for long. Call poll() regularly and it moves a
+state machine on by one step:
+
+- DISCONNECTED - wait for the WiFi, reconnecting with backoff
+- RESOLVE - look up the NTP server address, which can block
+- REQUEST - send the NTP request from a non-blocking UDP socket
+- WAIT - poll the socket for the reply until it times out
+- SYNCED - wait for the next resync
+
+Failures retry with exponential backoff. The clock isn't set, instead
+the offset from NTP is kept and time() returns the corrected time.
+
+The DNS lookup of the server name is the only call which can block,
+for as long as the DNS server takes to answer. It is only done on the
+first sync, after a lookup or send error and when the WiFi reconnects
+- the address is kept when a reply just times out. Give the server as
+an IP address to skip the lookup altogether.
+
+This runs under CPython too, with no wlan, so it can be tried against
+a local fake NTP server with
+
+    python3 timeservice.py --fake
+"""
+
+import time
+import socket
+import struct
+
+try:
+    from time import ticks_ms, ticks_diff, ticks_add
+except ImportError:
+    # CPython
+    def ticks_ms():
+        return int(time.monotonic() * 1000)
+    def ticks_diff(a, b):
+        return a - b
+    def ticks_add(a, b):
+        return a + b
+
+# Seconds between the NTP epoch (1900) and the time epoch
+NTP_DELTA = 3155673600 if time.gmtime(0)[0] == 2000 else 2208988800
+
+# States
+DISCONNECTED = 0
+RESOLVE = 1
+REQUEST = 2
+WAIT = 3
+SYNCED = 4
+
+def is_ip(host):
+    """
+    Returns True if host is a dotted quad IP address which doesn't need
+    looking up
+    """
+    parts = host.split(".")
+    if len(parts) != 4:
+        return False
+    for part in parts:
+        if not part.isdigit() or int(part) > 255:
+            return False
+    return True
+
+def dst_offset(now):
+    """
+    Return the daylight savings time offset in hours for UK & Europe at
+    time now.
+
+    This is incorrect for US.
+
+    Adapted from: https://forum.micropython.org/viewtopic.php?f=2&t=4034 by JumpZero
+    """
+    year = time.gmtime(now)[0]              # get current year
+    HHMarch   = time.mktime((year,3 ,(31-(int(5*year/4+4))%7),1,0,0,0,0,0)) # Time of March change to Summer Time
+    HHOctober = time.mktime((year,10,(31-(int(5*year/4+1))%7),1,0,0,0,0,0)) # Time of October change to Winter Time
+    if now < HHMarch :                    # we are before last sunday of March
+        offset = 0
+    elif now < HHOctober :                # we are before last sunday of October
+        offset = 1
+    else:                                 # we are after last sunday of October
+        offset = 0
+    return offset
+
+class TimeService:
+    """
+    Keeps the time set from NTP without blocking
+
+    wlan is the network.WLAN to keep connected with ssid and password,
+    or None if the network is always up. tz is the base timezone offset
+    from UTC in hours. host is the NTP server - an IP address is used
+    as is without a DNS lookup.
+    """
+    def __init__(self, wlan=None, ssid=None, password=None, tz=0, host="pool.ntp.org", port=123,
+                 timeout_ms=2000, resync_ms=6*3600*1000, min_backoff_ms=1000, max_backoff_ms=300000):
+        self.wlan = wlan
+        self.ssid = ssid
+        self.password = password
+        self.tz = tz
+        self.host = host
+        self.port = port
+        self.timeout_ms = timeout_ms
+        self.resync_ms = resync_ms
+        self.min_backoff_ms = min_backoff_ms
+        self.max_backoff_ms = max_backoff_ms
+        self.backoff_ms = min_backoff_ms
+        self.state = DISCONNECTED
+        self.addr = None
+        self.sock = None
+        self.request = bytearray(48)
+        self.request[0] = 0x1B              # LI 0, version 3, client
+        self.sent = 0
+        self.next_try = ticks_ms()
+        self.next_sync = 0
+        self.next_dst = 0
+        self.synced = False
+        self.delta = 0                      # NTP time - time.time()
+        self.offset = 0                     # local time - UTC in seconds
+        self.syncs = 0
+        self.failures = 0
+    def time(self):
+        """
+        Return the corrected time in seconds since the epoch
+        """
+        return time.time() + self.delta
+    def localtime(self):
+        """
+        Returns the broken down local time or None if not synced yet
+        """
+        if not self.synced:
+            return None
+        return time.gmtime(self.time() + self.offset)
+    def fail(self, why, forget=False):
+        """
+        Note a failure and back off before trying again
+
+        If forget is set the address is looked up again next time.
+        """
+        print("Time sync failed:", why)
+        self.failures += 1
+        self.close()
+        self.next_try = ticks_add(ticks_ms(), self.backoff_ms)
+        self.backoff_ms = min(2*self.backoff_ms, self.max_backoff_ms)
+        if forget:
+            self.addr = None
+        self.state = DISCONNECTED
+    def close(self):
+        """
+        Close the socket if open
+        """
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+    def update_offset(self):
+        """
+        Recalculate the local time offset for daylight savings
+        """
+        self.offset = (dst_offset(self.time()) + self.tz) * 3600
+        self.next_dst = ticks_add(ticks_ms(), 3600*1000)
+    def poll(self):
+        """
+        Move the time service on by one step
+
+        This only blocks in the DNS lookup of a server name, see RESOLVE.
+        """
+        now = ticks_ms()
+        if self.state == DISCONNECTED:
+            if ticks_diff(now, self.next_try) < 0:
+                return
+            if self.wlan is None or self.wlan.isconnected():
+                self.state = RESOLVE if self.addr is None else REQUEST
+            elif self.wlan.status() <= 0:
+                # Link down or connection failed
+                print("Connecting to WiFi")
+                self.addr = None
+                self.wlan.connect(self.ssid, self.password)
+                self.next_try = ticks_add(now, self.backoff_ms)
+                self.backoff_ms = min(2*self.backoff_ms, self.max_backoff_ms)
+        elif self.state == RESOLVE:
+            if is_ip(self.host):
+                self.addr = (self.host, self.port)
+                self.state = REQUEST
+                return
+            try:
+                self.addr = socket.getaddrinfo(self.host, self.port)[0][-1]
+            except OSError as e:
+                self.fail(e, forget=True)
+                return
+            self.state = REQUEST
+        elif self.state == REQUEST:
+            try:
+                self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                self.sock.setblocking(False)
+                self.sock.sendto(self.request, self.addr)
+            except OSError as e:
+                self.fail(e, forget=True)
+                return
+            self.sent = now
+            self.state = WAIT
+        elif self.state == WAIT:
+            try:
+                msg = self.sock.recv(48)
+            except OSError:
+                # Nothing received yet
+                if ticks_diff(now, self.sent) > self.timeout_ms:
+                    self.fail("timeout")
+                return
+            self.close()
+            if len(msg) < 48:
+                self.fail("short reply")
+                return
+            self.delta = struct.unpack("!I", msg[40:44])[0] - NTP_DELTA - time.time()
+            self.synced = True
+            self.syncs += 1
+            self.backoff_ms = self.min_backoff_ms
+            self.next_sync = ticks_add(now, self.resync_ms)
+            self.update_offset()
+            self.state = SYNCED
+            print("UTC Time:   %s" % (time.gmtime(self.time()),))
+            print("Local Time: %s" % (self.localtime(),))
+        elif self.state == SYNCED:
+            if ticks_diff(now, self.next_sync) >= 0:
+                self.state = DISCONNECTED
+            elif ticks_diff(now, self.next_dst) >= 0:
+                self.update_offset()
+
+def serve_fake_ntp(port, skew=0, drop=0):
+    """
+    Run a fake NTP server on localhost in a thread for testing
+
+    It answers with the time shifted by skew seconds and ignores the
+    first drop requests.
+    """
+    import threading
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", port))
+    def serve():
+        dropped = 0
+        while True:
+            msg, addr = sock.recvfrom(48)
+            if dropped < drop:
+                dropped += 1
+                continue
+            reply = bytearray(48)
+            reply[0] = 0x1C                 # LI 0, version 3, server
+            reply[40:44] = struct.pack("!I", int(time.time() + skew + NTP_DELTA))
+            sock.sendto(reply, addr)
+    threading.Thread(target=serve, daemon=True).start()
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Try the time service against an NTP server")
+    parser.add_argument("host", nargs="?", default="pool.ntp.org", help="NTP server")
+    parser.add_argument("--port", type=int, default=123, help="NTP port")
+    parser.add_argument("--fake", action="store_true", help="run a fake NTP server on localhost")
+    parser.add_argument("--skew", type=int, default=3600, help="seconds the fake server is out by")
+    parser.add_argument("--drop", type=int, default=2, help="requests the fake server ignores")
+    args = parser.parse_args()
+    if args.fake:
+        args.host = "127.0.0.1"
+        if args.port == 123:
+            args.port = 12300
+        serve_fake_ntp(args.port, args.skew, args.drop)
+    service = TimeService(host=args.host, port=args.port, timeout_ms=500, resync_ms=5000)
+    start = time.time()
+    while service.syncs < 2:
+        start_poll = ticks_ms()
+        service.poll()
+        took = ticks_diff(ticks_ms(), start_poll)
+        if took > 5:
+            print("poll took", took, "ms")
+        time.sleep(0.04)
+    print("Synced twice in %.1f s with %d failures, clock is out by %d s" % (time.time() - start, service.failures, service.delta))
+
+if __name__ == "__main__":
+    main()